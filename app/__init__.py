@@ -3,14 +3,14 @@
 from flask import Flask
 from flask_restx import Api
 from flask_login import LoginManager
-from flask_caching import Cache
-import sentry_sdk
-from sentry_sdk.integrations.flask import FlaskIntegration
 from .config import Config
+from .cache import cache
 from .rate_limiter import RedisRateLimiter
 from .tasks import celery
+from .threads import response_cache
 from .api.crosspost import ns as crosspost_ns
 from .api.health import ns as health_ns
+from .api.threads_endpoints import ns as threads_ns
 
 def create_app():
     app = Flask(__name__)
@@ -18,10 +18,13 @@ def create_app():
 
     # Initialize Sentry
     if app.config['SENTRY_DSN']:
+        import sentry_sdk
+        from sentry_sdk.integrations.flask import FlaskIntegration
+
         sentry_sdk.init(
             dsn=app.config['SENTRY_DSN'],
             integrations=[FlaskIntegration()],
-            traces_sample_rate=1.0
+            traces_sample_rate=app.config['SENTRY_TRACES_SAMPLE_RATE']
         )
 
     # Initialize Flask-RESTX
@@ -30,9 +33,11 @@ def create_app():
               doc='/swagger/')
     api.add_namespace(crosspost_ns)
     api.add_namespace(health_ns)
+    api.add_namespace(threads_ns)
 
     # Initialize Cache
-    cache = Cache(app)
+    cache.init_app(app)
+    response_cache.init_app(app)
 
     # Initialize Login Manager
     login_manager = LoginManager()
@@ -2,23 +2,76 @@
 
 from flask_restx import Namespace, Resource, fields
 from flask import request
-from ..utils import validate_content, optimize_content
-from ..tasks import post_content_task
-from ..rate_limiter import RedisRateLimiter
-from ..config import Config, PLATFORM_CONSTRAINTS
+from ..utils import validate_content, validate_many, optimize_for_platforms
+from ..tasks import post_content_task, enqueue_crosspost, enqueue_crosspost_batch, crosspost_status
+from ..rate_limiter import rate_limiter, rate_limit_headers
+from ..idempotency import idempotency_store, content_hash, PENDING
+from ..config import Config
+from ..scheduler import post_scheduler
+from ..media import resolve_media
+import json
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
 ns = Namespace('crosspost', description='Cross-post operations')
 
+media_model = ns.model('Media', {
+    'path': fields.String(required=True, description='File path relative to MEDIA_ROOT'),
+    'alt_text': fields.String(required=False, description='Alternative text for images')
+})
+
 post_model = ns.model('Post', {
-    'content': fields.String(required=True, description='Content to cross-post')
+    'content': fields.String(required=True, description='Content to cross-post'),
+    'publish_at': fields.DateTime(required=False, description='ISO 8601 time to publish at; omit to post now'),
+    'media': fields.List(fields.Nested(media_model), required=False,
+                         description='Up to four images, or one GIF or video, to attach')
 })
 
-# Initialize Rate Limiter
-rate_limiter = RedisRateLimiter(Config.REDIS_URL, Config.RATE_LIMIT_REQUESTS, Config.RATE_LIMIT_WINDOW)
+def _parse_media(value):
+    """Validates a post's media; returns (items, error) with items as the workers receive them."""
+    files, error = resolve_media(value)
+    if error:
+        return None, error
+    if not files:
+        return None, None
+    return [{"path": item["path"], "alt_text": item.get("alt_text")} for item in value], None
+
+def _fingerprint(content, media=None, publish_at=None):
+    """What makes two cross-posts duplicates of each other."""
+    fingerprint = content
+    if media:
+        fingerprint += "\n" + json.dumps(media, sort_keys=True)
+    if publish_at is not None:
+        fingerprint += f"\n@{publish_at}"
+    return fingerprint
+
+def _parse_publish_at(value):
+    """Parses publish_at into a UNIX timestamp; returns (timestamp, error)."""
+    if value is None:
+        return None, None
+    try:
+        if isinstance(value, (int, float)):
+            publish_at = float(value)
+        else:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            publish_at = parsed.timestamp()
+    except (TypeError, ValueError):
+        return None, "publish_at must be an ISO 8601 datetime"
+    if publish_at > time.time() + Config.SCHEDULE_MAX_DAYS_AHEAD * 86400:
+        return None, f"publish_at cannot be more than {Config.SCHEDULE_MAX_DAYS_AHEAD} days ahead"
+    return publish_at, None
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+batch_model = ns.model('PostBatch', {
+    'posts': fields.List(fields.Nested(post_model), required=True, description='Posts to cross-post')
+})
 
 @ns.route('/')
 class CrossPost(Resource):
@@ -28,8 +81,9 @@ class CrossPost(Resource):
         try:
             # Rate limiting check
             client_id = request.headers.get('X-API-Key', 'default')
-            if not rate_limiter.is_allowed(client_id):
-                return {"error": "Rate limit exceeded"}, 429
+            limit = rate_limiter.check(client_id)
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
 
             # Input validation
             data = request.get_json()
@@ -41,25 +95,267 @@ class CrossPost(Resource):
             if not is_valid:
                 return {"error": error_message}, 400
 
-            # Optimize content for each platform
-            optimized_content = {}
-            for platform in PLATFORM_CONSTRAINTS.keys():
-                optimized_content[platform] = optimize_content(content, platform)
+            publish_at, error_message = _parse_publish_at(data.get('publish_at'))
+            if error_message:
+                return {"error": error_message}, 400
 
-            # Enqueue tasks
-            task_results = {}
-            for platform, opt_content in optimized_content.items():
-                task = post_content_task.delay(platform, opt_content, client_id)
-                task_results[platform] = task.id  # Return task IDs to client
+            media, error_message = _parse_media(data.get('media'))
+            if error_message:
+                return {"error": error_message}, 400
+
+            # Replay duplicates instead of optimizing and posting again; the
+            # same content with other media or scheduled for another time is
+            # not a duplicate
+            fingerprint = _fingerprint(content, media, publish_at)
+            dedup_key = idempotency_store.make_key(client_id, request.headers.get('Idempotency-Key'), fingerprint)
+            if dedup_key:
+                existing = idempotency_store.claim(dedup_key, fingerprint)
+                if existing:
+                    return self._replay(existing, fingerprint, limit)
 
-            logger.info(f"Cross-post tasks enqueued for client {client_id}")
+            try:
+                response, status = self._crosspost(content, client_id, publish_at, media)
+            except Exception:
+                if dedup_key:
+                    idempotency_store.release(dedup_key)
+                raise
+            if dedup_key:
+                if status == 202:
+                    idempotency_store.complete(dedup_key, fingerprint, response)
+                else:
+                    idempotency_store.release(dedup_key)
+            return response, status, rate_limit_headers(limit)
 
+        except Exception as e:
+            logger.error(f"Error in crosspost: {str(e)}")
+            return {"error": "Internal server error"}, 500
+
+    @staticmethod
+    def _replay(existing, content, limit):
+        """Answers a duplicate request from the original request's record."""
+        if existing.get("content_hash") != content_hash(content):
+            return {"error": "Idempotency-Key was already used with different content"}, 422, rate_limit_headers(limit)
+        if existing.get("state") == PENDING:
+            return {"error": "An identical cross-post is already in progress"}, 409, rate_limit_headers(limit)
+        headers = dict(rate_limit_headers(limit), **{"Idempotent-Replayed": "true"})
+        return dict(existing["response"], duplicate=True), 202, headers
+
+    @staticmethod
+    def _crosspost(content, client_id, publish_at=None, media=None):
+        """Enqueues or schedules a validated cross-post and returns (body, status)."""
+        if publish_at is not None and publish_at > time.time():
+            post = post_scheduler.schedule(content, client_id, publish_at, media=media)
+            logger.info(f"Cross-post {post['id']} scheduled for {_isoformat(publish_at)} for client {client_id}")
+            return {
+                "message": "Cross-post scheduled",
+                "crosspost_id": post["id"],
+                "publish_at": _isoformat(publish_at),
+                "status_url": ns.path + f"/{post['id']}",
+                "timestamp": datetime.utcnow().isoformat()
+            }, 202
+
+        # Hand optimization and posting to the workers
+        if Config.OPTIMIZE_IN_WORKER:
+            result = enqueue_crosspost(content, client_id, media=media)
+            crosspost_id = result.id
+            task_results = {
+                child.id.split(':')[1]: child.id for child in result.results
+            }
+            logger.info(f"Cross-post pipeline {crosspost_id} enqueued for client {client_id}")
             return {
                 "message": "Cross-post tasks enqueued",
+                "crosspost_id": crosspost_id,
                 "tasks": task_results,
+                "status_url": ns.path + f"/{crosspost_id}",
                 "timestamp": datetime.utcnow().isoformat()
             }, 202
 
+        # Optimize content for all platforms concurrently
+        optimized_content, errors, timings = optimize_for_platforms(content)
+        if not optimized_content:
+            logger.error(f"Optimization failed for all platforms: {errors}")
+            return {
+                "error": "Content optimization failed",
+                "errors": errors,
+                "timings": timings
+            }, 502
+
+        # Enqueue tasks
+        task_results = {}
+        for platform, opt_content in optimized_content.items():
+            task = post_content_task.delay(platform, opt_content, client_id, media=media)
+            task_results[platform] = task.id  # Return task IDs to client
+
+        logger.info(f"Cross-post tasks enqueued for client {client_id}")
+
+        response = {
+            "message": "Cross-post tasks enqueued",
+            "tasks": task_results,
+            "timings": timings,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        if errors:
+            response["errors"] = errors
+        return response, 202
+
+@ns.route('/batch')
+class CrossPostBatch(Resource):
+    @ns.expect(batch_model)
+    def post(self):
+        """Cross-post a batch of contents with one grouped enqueue."""
+        try:
+            data = request.get_json()
+            posts = data.get('posts') if isinstance(data, dict) else None
+            if not isinstance(posts, list) or not posts:
+                return {"error": "A non-empty list of posts is required"}, 400
+            if len(posts) > Config.CROSSPOST_BATCH_MAX_SIZE:
+                return {"error": f"Batch exceeds maximum of {Config.CROSSPOST_BATCH_MAX_SIZE} posts"}, 400
+
+            # Rate limiting check, one request of quota per post
+            client_id = request.headers.get('X-API-Key', 'default')
+            limit = rate_limiter.check(client_id, cost=len(posts))
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
+
+            # Validate in bulk and dedupe identical posts; posts with a future
+            # publish_at are scheduled, the rest are enqueued together
+            contents = [post.get('content') if isinstance(post, dict) else None for post in posts]
+            items, first_index, accepted = {}, {}, []
+            now = time.time()
+            for index, (content, (is_valid, error_message)) in enumerate(zip(contents, validate_many(contents))):
+                media = publish_at = None
+                if is_valid:
+                    publish_at, error_message = _parse_publish_at(posts[index].get('publish_at'))
+                    is_valid = error_message is None
+                if is_valid:
+                    media, error_message = _parse_media(posts[index].get('media'))
+                    is_valid = error_message is None
+                if not is_valid:
+                    items[str(index)] = {"status": "invalid", "error": error_message}
+                    continue
+
+                fingerprint = _fingerprint(content, media, publish_at)
+                if fingerprint in first_index:
+                    items[str(index)] = {"status": "duplicate", "duplicate_of": first_index[fingerprint]}
+                    continue
+                first_index[fingerprint] = index
+                if publish_at is not None and publish_at > now:
+                    post = post_scheduler.schedule(content, client_id, publish_at, media=media)
+                    items[str(index)] = {
+                        "status": "scheduled",
+                        "crosspost_id": post["id"],
+                        "publish_at": _isoformat(publish_at)
+                    }
+                else:
+                    accepted.append((index, content, media))
+
+            if not first_index:
+                return {"error": "No valid posts in batch", "items": items}, 400, rate_limit_headers(limit)
+
+            response = {"message": "Cross-post batch enqueued"}
+            if accepted:
+                result = enqueue_crosspost_batch([content for _, content, _ in accepted], client_id,
+                                                 media=[media for _, _, media in accepted])
+                for (index, _, _), crosspost in zip(accepted, result.results):
+                    items[str(index)] = {
+                        "status": "enqueued",
+                        "crosspost_id": crosspost.id,
+                        "tasks": {child.id.split(':')[1]: child.id for child in crosspost.results}
+                    }
+                response.update(batch_id=result.id, status_url=ns.path + f"/{result.id}")
+                logger.info(f"Cross-post batch {result.id} with {len(accepted)} posts enqueued for client {client_id}")
+            else:
+                response["message"] = "Cross-post batch scheduled"
+            for item in items.values():
+                if item["status"] == "duplicate":
+                    item.update({k: v for k, v in items[str(item["duplicate_of"])].items() if k != "status"})
+
+            return dict(response, **{
+                "enqueued": len(accepted),
+                "scheduled": sum(item["status"] == "scheduled" for item in items.values()),
+                "failed": sum(item["status"] == "invalid" for item in items.values()),
+                "items": dict(sorted(items.items(), key=lambda item: int(item[0]))),
+                "timestamp": datetime.utcnow().isoformat()
+            }), 202, rate_limit_headers(limit)
+
         except Exception as e:
-            logger.error(f"Error in crosspost: {str(e)}")
-            return {"error": "Internal server error"}, 500
\ No newline at end of file
+            logger.error(f"Error in crosspost batch: {str(e)}")
+            return {"error": "Internal server error"}, 500
+
+@ns.route('/scheduled')
+class ScheduledPosts(Resource):
+    @ns.param('limit', 'Maximum number of posts to return (max 200)')
+    @ns.param('offset', 'Number of posts to skip')
+    def get(self):
+        """List the client's upcoming scheduled posts in publish order."""
+        try:
+            # Rate limiting check
+            client_id = request.headers.get('X-API-Key', 'default')
+            limit = rate_limiter.check(client_id)
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
+
+            count = min(request.args.get('limit', 50, type=int), 200)
+            offset = max(request.args.get('offset', 0, type=int), 0)
+            posts = post_scheduler.upcoming(client_id, count, offset)
+            return {
+                "scheduled": [{
+                    "crosspost_id": post["id"],
+                    "content": post["content"],
+                    "publish_at": _isoformat(post["publish_at"])
+                } for post in posts],
+                "offset": offset
+            }, 200, rate_limit_headers(limit)
+
+        except Exception as e:
+            logger.error(f"Error listing scheduled posts: {str(e)}")
+            return {"error": "Internal server error"}, 500
+
+@ns.route('/scheduled/<string:schedule_id>')
+class ScheduledPost(Resource):
+    def delete(self, schedule_id):
+        """Cancel a scheduled post that has not been dispatched yet."""
+        try:
+            # Rate limiting check
+            client_id = request.headers.get('X-API-Key', 'default')
+            limit = rate_limiter.check(client_id)
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
+
+            cancelled = post_scheduler.cancel(schedule_id, client_id)
+            if cancelled is None:
+                return {"error": "Scheduled post not found"}, 404, rate_limit_headers(limit)
+            if not cancelled:
+                return {"error": "Scheduled post is already being published"}, 409, rate_limit_headers(limit)
+            return {"message": "Scheduled post cancelled", "crosspost_id": schedule_id}, 200, rate_limit_headers(limit)
+
+        except Exception as e:
+            logger.error(f"Error cancelling scheduled post {schedule_id}: {str(e)}")
+            return {"error": "Internal server error"}, 500
+
+@ns.route('/<string:crosspost_id>')
+class CrossPostStatus(Resource):
+    def get(self, crosspost_id):
+        """Fetch the state of every task in a cross-post pipeline."""
+        try:
+            # Rate limiting check
+            client_id = request.headers.get('X-API-Key', 'default')
+            limit = rate_limiter.check(client_id)
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
+
+            status = crosspost_status(crosspost_id)
+            if status is None:
+                scheduled = post_scheduler.get(crosspost_id)
+                if scheduled is None:
+                    return {"error": "Cross-post not found"}, 404
+                status = {
+                    "crosspost_id": crosspost_id,
+                    "status": "SCHEDULED",
+                    "publish_at": _isoformat(scheduled["publish_at"])
+                }
+            return status, 200, rate_limit_headers(limit)
+
+        except Exception as e:
+            logger.error(f"Error fetching status for crosspost {crosspost_id}: {str(e)}")
+            return {"error": "Internal server error"}, 500
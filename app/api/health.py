@@ -1,16 +1,39 @@
 # app/api/health.py
 
+from flask import Response
 from flask_restx import Namespace, Resource
 from datetime import datetime
+from ..http_client import http_clients
+from ..metrics import metrics
+from ..resilience import circuit_breaker, RETRY_POLICIES
 
 ns = Namespace('health', description='Health check operations')
 
 @ns.route('/')
 class HealthCheck(Resource):
     def get(self):
-        """Health check endpoint."""
+        """Health check endpoint, including each platform's circuit breaker."""
+        circuits = circuit_breaker.states(RETRY_POLICIES)
+        # "unknown" means breaker state could not be read, not that a platform is failing
+        degraded = any(circuit["state"] in ("open", "half_open") for circuit in circuits.values())
         return {
-            "status": "OK",
+            "status": "DEGRADED" if degraded else "OK",
+            "circuits": circuits,
             "timestamp": datetime.utcnow().isoformat(),
             "version": "1.0.0"
-        }, 200
\ No newline at end of file
+        }, 200
+
+@ns.route('/connections')
+class ConnectionPools(Resource):
+    def get(self):
+        """Outbound connection pool reuse and saturation for this process."""
+        return {
+            "pools": http_clients.stats(),
+            "timestamp": datetime.utcnow().isoformat()
+        }, 200
+
+@ns.route('/metrics')
+class Metrics(Resource):
+    def get(self):
+        """Prometheus metrics aggregated across web and worker processes."""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -1,36 +1,67 @@
 # app/api/threads_endpoints.py
 
 from flask_restx import Namespace, Resource, fields
-from flask import request
-from ..threads import get_thread_replies, reply_to_thread, delete_thread_reply, get_thread_insights
+from flask import request, make_response, Response, stream_with_context
+from werkzeug.http import quote_etag
+from ..threads import reply_to_thread, delete_thread_reply, response_cache
+from ..threads_async import get_insights_many, get_replies_many, iter_replies
 from ..config import Config
-from ..rate_limiter import RedisRateLimiter
+from ..insights import insights_warehouse, INTERVALS
+from ..rate_limiter import rate_limiter, rate_limit_headers
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 ns = Namespace('threads', description='Threads operations')
 
+def _cached_response(thread_id, resource, limit):
+    """Serves a cached thread resource with ETag / If-None-Match support."""
+    entry = response_cache.get(thread_id, resource)
+    headers = rate_limit_headers(limit)
+    headers["ETag"] = quote_etag(entry["etag"], weak=True)
+    headers["Cache-Control"] = f"private, max-age={response_cache.ttls[resource]}"
+    if request.if_none_match.contains_weak(entry["etag"]):
+        response = make_response('', 304)
+        response.headers.update(headers)
+        return response
+    return entry["body"], 200, headers
+
 # Models for request and response validation
 reply_model = ns.model('Reply', {
     'message': fields.String(required=True, description='Reply message')
 })
 
-# Initialize Rate Limiter
-rate_limiter = RedisRateLimiter(Config.REDIS_URL, Config.RATE_LIMIT_REQUESTS, Config.RATE_LIMIT_WINDOW)
+def _stream_replies(thread_id, limit):
+    """Streams replies as newline-delimited JSON while walking upstream pages."""
+    page_size = request.args.get('page_size', type=int)
+
+    def generate():
+        try:
+            for reply in iter_replies(thread_id, page_size):
+                yield json.dumps(reply) + "\n"
+        except Exception as e:
+            logger.error(f"Error streaming replies for thread {thread_id}: {str(e)}")
+            yield json.dumps({"error": "Upstream error while streaming replies"}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers=rate_limit_headers(limit))
 
 @ns.route('/<string:thread_id>/replies')
 class ThreadReplies(Resource):
+    @ns.doc(params={'stream': 'Set to 1 to stream replies as NDJSON', 'page_size': 'Upstream page size when streaming'})
     def get(self, thread_id):
         """Fetch replies to a specific thread."""
         try:
             # Rate limiting
             client_id = request.headers.get('X-API-Key', 'default')
-            if not rate_limiter.is_allowed(client_id):
-                return {"error": "Rate limit exceeded"}, 429
+            limit = rate_limiter.check(client_id)
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
 
-            replies = get_thread_replies(thread_id)
-            return replies, 200
+            if request.args.get('stream', '').lower() in ('1', 'true'):
+                return _stream_replies(thread_id, limit)
+            return _cached_response(thread_id, "replies", limit)
 
         except Exception as e:
             logger.error(f"Error fetching replies for thread {thread_id}: {str(e)}")
@@ -42,8 +73,9 @@ class ThreadReplies(Resource):
         try:
             # Rate limiting
             client_id = request.headers.get('X-API-Key', 'default')
-            if not rate_limiter.is_allowed(client_id):
-                return {"error": "Rate limit exceeded"}, 429
+            limit = rate_limiter.check(client_id)
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
 
             data = request.get_json()
             message = data.get('message')
@@ -51,7 +83,7 @@ class ThreadReplies(Resource):
                 return {"error": "Message content is required"}, 400
 
             response = reply_to_thread(thread_id, message)
-            return response, 201
+            return response, 201, rate_limit_headers(limit)
 
         except Exception as e:
             logger.error(f"Error posting reply to thread {thread_id}: {str(e)}")
@@ -64,11 +96,12 @@ class ThreadReply(Resource):
         try:
             # Rate limiting
             client_id = request.headers.get('X-API-Key', 'default')
-            if not rate_limiter.is_allowed(client_id):
-                return {"error": "Rate limit exceeded"}, 429
+            limit = rate_limiter.check(client_id)
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
 
             response = delete_thread_reply(thread_id, reply_id)
-            return response, 200
+            return response, 200, rate_limit_headers(limit)
 
         except Exception as e:
             logger.error(f"Error deleting reply {reply_id} from thread {thread_id}: {str(e)}")
@@ -81,12 +114,105 @@ class ThreadInsights(Resource):
         try:
             # Rate limiting
             client_id = request.headers.get('X-API-Key', 'default')
-            if not rate_limiter.is_allowed(client_id):
-                return {"error": "Rate limit exceeded"}, 429
+            limit = rate_limiter.check(client_id)
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
 
-            insights = get_thread_insights(thread_id)
-            return insights, 200
+            return _cached_response(thread_id, "insights", limit)
 
         except Exception as e:
             logger.error(f"Error fetching insights for thread {thread_id}: {str(e)}")
-            return {"error": "Internal server error"}, 500
\ No newline at end of file
+            return {"error": "Internal server error"}, 500
+
+def _bulk_ids():
+    """Parses the comma-separated ids query parameter of bulk endpoints."""
+    ids = [thread_id.strip() for thread_id in request.args.get('ids', '').split(',') if thread_id.strip()]
+    return list(dict.fromkeys(ids))
+
+@ns.route('/replies')
+class BulkThreadReplies(Resource):
+    @ns.doc(params={'ids': 'Comma-separated thread IDs'})
+    def get(self):
+        """Fetch every reply of several threads concurrently."""
+        try:
+            ids = _bulk_ids()
+            if not ids:
+                return {"error": "At least one thread ID is required"}, 400
+            if len(ids) > Config.THREADS_BULK_MAX_IDS:
+                return {"error": f"At most {Config.THREADS_BULK_MAX_IDS} thread IDs are allowed"}, 400
+
+            # Rate limiting, one request of quota per thread
+            client_id = request.headers.get('X-API-Key', 'default')
+            limit = rate_limiter.check(client_id, cost=len(ids))
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
+
+            return get_replies_many(ids), 200, rate_limit_headers(limit)
+
+        except Exception as e:
+            logger.error(f"Error fetching bulk replies: {str(e)}")
+            return {"error": "Internal server error"}, 500
+
+@ns.route('/insights')
+class BulkThreadInsights(Resource):
+    @ns.doc(params={'ids': 'Comma-separated thread IDs'})
+    def get(self):
+        """Fetch insights for several threads concurrently."""
+        try:
+            ids = _bulk_ids()
+            if not ids:
+                return {"error": "At least one thread ID is required"}, 400
+            if len(ids) > Config.THREADS_BULK_MAX_IDS:
+                return {"error": f"At most {Config.THREADS_BULK_MAX_IDS} thread IDs are allowed"}, 400
+
+            # Rate limiting, one request of quota per thread
+            client_id = request.headers.get('X-API-Key', 'default')
+            limit = rate_limiter.check(client_id, cost=len(ids))
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
+
+            return get_insights_many(ids), 200, rate_limit_headers(limit)
+
+        except Exception as e:
+            logger.error(f"Error fetching bulk insights: {str(e)}")
+            return {"error": "Internal server error"}, 500
+
+@ns.route('/insights/summary')
+class ThreadInsightsSummary(Resource):
+    @ns.doc(params={
+        'metric': 'Metric of the time series and top threads (default views)',
+        'from': 'Start of the range as a Unix time',
+        'to': 'End of the range as a Unix time',
+        'interval': 'Time series bucket: hour, day or week (default day)',
+        'top': 'Number of top threads to return (default 10)',
+        'thread_id': 'Limit the summary to one thread'
+    })
+    def get(self):
+        """Aggregate harvested insights from the local warehouse."""
+        try:
+            # Rate limiting
+            client_id = request.headers.get('X-API-Key', 'default')
+            limit = rate_limiter.check(client_id)
+            if not limit.allowed:
+                return {"error": "Rate limit exceeded"}, 429, rate_limit_headers(limit)
+
+            interval = request.args.get('interval', 'day')
+            if interval not in INTERVALS:
+                return {"error": f"interval must be one of {', '.join(INTERVALS)}"}, 400
+            top = request.args.get('top', 10, type=int)
+            if not 0 <= top <= 100:
+                return {"error": "top must be between 0 and 100"}, 400
+
+            summary = insights_warehouse.summary(
+                request.args.get('metric', 'views'),
+                start=request.args.get('from', type=int),
+                end=request.args.get('to', type=int),
+                interval=interval,
+                top=top,
+                thread_id=request.args.get('thread_id')
+            )
+            return summary, 200, rate_limit_headers(limit)
+
+        except Exception as e:
+            logger.error(f"Error summarizing thread insights: {str(e)}")
+            return {"error": "Internal server error"}, 500
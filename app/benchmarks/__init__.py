@@ -0,0 +1,3 @@
+# app/benchmarks/__init__.py
+
+# Offline benchmarks; run modules with `python -m app.benchmarks.<name>`
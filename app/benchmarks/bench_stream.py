@@ -0,0 +1,55 @@
+# app/benchmarks/bench_stream.py
+
+import argparse
+import os
+import random
+import statistics
+import time
+from .stubs import StubConfig, start_stub_server, stub_environment, PLATFORM_LIMITS
+from .bench_validate import SENTENCES
+
+def run(optimize_content, counts, platform, samples, rng):
+    """Optimizes fresh content repeatedly; returns latencies and tokens generated by the stub."""
+    latencies = []
+    tokens_before = counts.get('anthropic_tokens', 0)
+    for i in range(samples):
+        content = " ".join(rng.choice(SENTENCES['en']) for _ in range(rng.randint(1, 6))) + f" #{rng.random()}"
+        start = time.perf_counter()
+        optimize_content(content, platform)
+        latencies.append(time.perf_counter() - start)
+    # Give cancelled stub streams a moment to notice the closed connection
+    time.sleep(0.2)
+    return latencies, (counts.get('anthropic_tokens', 0) - tokens_before) / samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares buffered and streamed optimization against the stub model.")
+    parser.add_argument('--samples', type=int, default=50, help='optimizations per platform and mode')
+    parser.add_argument('--latency', type=float, default=0.2, help='stub time to first token in seconds')
+    parser.add_argument('--token-latency', type=float, default=0.01, help='stub seconds per generated token')
+    args = parser.parse_args()
+
+    stub = start_stub_server(StubConfig(args.latency, 0.0, token_latency=args.token_latency))
+    os.environ.update(stub_environment(stub))
+    for platform in PLATFORM_LIMITS:
+        os.environ[f"{platform.upper()}_OPTIMIZE_POLICY"] = "llm"
+
+    # Imported after the environment points the Anthropic client at the stub
+    from ..config import Config
+    from ..utils import optimize_content
+
+    counts = stub.RequestHandlerClass.counts
+    rng = random.Random(0)
+    print(f"{'platform':<10}{'mode':<10}{'p50 ms':>10}{'mean ms':>10}{'tokens':>10}")
+    try:
+        for platform in PLATFORM_LIMITS:
+            for stream in (False, True):
+                Config.OPTIMIZE_STREAM = stream
+                latencies, tokens = run(optimize_content, counts, platform, args.samples, rng)
+                print(f"{platform:<10}{'stream' if stream else 'buffered':<10}"
+                      f"{statistics.median(latencies) * 1000:>10.1f}{statistics.mean(latencies) * 1000:>10.1f}"
+                      f"{tokens:>10.1f}")
+    finally:
+        stub.shutdown()
+
+if __name__ == '__main__':
+    main()
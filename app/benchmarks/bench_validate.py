@@ -0,0 +1,74 @@
+# app/benchmarks/bench_validate.py
+
+import argparse
+import random
+import string
+import time
+from ..validation import ContentValidator
+
+SENTENCES = {
+    'en': [
+        "We just shipped a new release with faster uploads and better search.",
+        "Join us on Friday for a live Q&A about the roadmap and what is next for the team!",
+        "Thanks to everyone who came to the meetup, we will share the slides soon.",
+    ],
+    'es': [
+        "Hemos lanzado una nueva versión con subidas más rápidas y la mejor búsqueda.",
+        "Gracias a todos por venir al evento, compartiremos las fotos en la web.",
+    ],
+    'fr': [
+        "Nous avons publié une nouvelle version avec des envois plus rapides.",
+        "Merci à tous pour votre présence, nous partagerons les photos dans la semaine.",
+    ],
+    'de': [
+        "Wir haben eine neue Version mit schnelleren Uploads veröffentlicht.",
+        "Danke an alle, die dabei waren, die Fotos kommen bald auf die Seite.",
+    ],
+}
+
+def make_posts(count: int, unique: int) -> list:
+    rng = random.Random(0)
+    pool = []
+    for i in range(unique):
+        sentences = SENTENCES[rng.choice(list(SENTENCES))]
+        pool.append(" ".join(rng.choice(sentences) for _ in range(rng.randint(1, 3))) + f" #{i}")
+    return [rng.choice(pool) for _ in range(count)]
+
+def make_terms(count: int) -> list:
+    rng = random.Random(1)
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12))) for _ in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark for the content validation engine.")
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--unique', type=int, default=2000, help='distinct contents among the posts')
+    parser.add_argument('--terms', type=int, default=10000, help='size of the prohibited term list')
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts, args.unique)
+    validator = ContentValidator(make_terms(args.terms), ['en', 'es', 'fr', 'de'])
+
+    start = time.perf_counter()
+    validator.load_language_profiles()
+    print(f"profile load:      {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    distinct = list(dict.fromkeys(posts))
+    start = time.perf_counter()
+    for post in distinct:
+        validator.validate(post)
+    cold = time.perf_counter() - start
+    print(f"validate (cold):   {len(distinct) / cold:,.0f} posts/s")
+
+    start = time.perf_counter()
+    for post in posts:
+        validator.validate(post)
+    warm = time.perf_counter() - start
+    print(f"validate (cached): {len(posts) / warm:,.0f} posts/s")
+
+    start = time.perf_counter()
+    validator.validate_many(posts)
+    batch = time.perf_counter() - start
+    print(f"validate_many:     {len(posts) / batch:,.0f} posts/s")
+
+if __name__ == '__main__':
+    main()
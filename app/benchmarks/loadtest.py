@@ -0,0 +1,177 @@
+# app/benchmarks/loadtest.py
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from .stubs import StubConfig, start_stub_server, stub_environment
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TERMINAL_STATES = {"SUCCESS", "PARTIAL", "FAILURE"}
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+def start_processes(args, env):
+    """Starts the web tier and, unless disabled, a Celery worker against the stubs."""
+    processes = []
+    if shutil.which('gunicorn'):
+        web = ['gunicorn', 'app.main:app', '--bind', f'127.0.0.1:{args.port}',
+               '--workers', str(args.web_workers), '--threads', str(args.web_threads), '--log-level', 'warning']
+    else:
+        web = [sys.executable, '-c',
+               f"from app.main import app; app.run(host='127.0.0.1', port={args.port}, threaded=True)"]
+    processes.append(subprocess.Popen(web, cwd=ROOT, env=env))
+
+    if not args.no_worker:
+        worker = [sys.executable, '-m', 'celery', '-A', 'app.tasks.celery', 'worker',
+                  '--loglevel=warning', '--concurrency', str(args.worker_concurrency)]
+        processes.append(subprocess.Popen(worker, cwd=ROOT, env=env))
+    return processes
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/health/", timeout=1).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Web tier did not come up at {base_url}")
+
+def drive_load(base_url, args):
+    """Sends cross-posts from concurrent clients and records per-request latency."""
+    latencies, statuses, crosspost_ids = [], {}, []
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+    rng = random.Random(0)
+    contents = [f"Benchmark post {i}: we just shipped a new release with faster uploads" for i in range(args.unique)]
+
+    def client(worker_id):
+        session = requests.Session()
+        headers = {"X-API-Key": f"bench-{worker_id}"}
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                response = session.post(f"{base_url}/crosspost/", headers=headers,
+                                        json={"content": rng.choice(contents)}, timeout=30)
+                status = response.status_code
+                body = response.json() if response.headers.get('Content-Type', '').startswith('application/json') else {}
+            except requests.exceptions.RequestException:
+                status, body = 'error', {}
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if body.get("crosspost_id"):
+                    crosspost_ids.append(body["crosspost_id"])
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(client, range(args.concurrency)))
+    return latencies, statuses, crosspost_ids, time.monotonic() - start
+
+def drain_tasks(base_url, crosspost_ids, timeout):
+    """Polls cross-post status until every pipeline finishes; returns (done tasks, seconds)."""
+    start = time.monotonic()
+    pending = set(crosspost_ids)
+    done_tasks = 0
+    session = requests.Session()
+    while pending and time.monotonic() - start < timeout:
+        for crosspost_id in list(pending):
+            response = session.get(f"{base_url}/crosspost/{crosspost_id}", headers={"X-API-Key": "bench-status"})
+            if response.status_code != 200:
+                continue
+            status = response.json()
+            if status.get("status") in TERMINAL_STATES:
+                pending.discard(crosspost_id)
+                done_tasks += 2 * len(status.get("platforms", {}))
+        time.sleep(0.2)
+    return done_tasks, len(pending), time.monotonic() - start
+
+def compare(report, baseline, tolerance):
+    """Returns the list of metrics that regressed beyond the tolerance."""
+    regressions = []
+    for metric in ("p50_ms", "p95_ms", "p99_ms"):
+        if baseline.get(metric) and report[metric] > baseline[metric] * (1 + tolerance):
+            regressions.append(f"{metric}: {report[metric]:.1f} > {baseline[metric]:.1f}")
+    for metric in ("requests_per_sec", "tasks_per_sec"):
+        if baseline.get(metric) and report[metric] < baseline[metric] * (1 - tolerance):
+            regressions.append(f"{metric}: {report[metric]:.1f} < {baseline[metric]:.1f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against local platform stand-ins.")
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent HTTP clients')
+    parser.add_argument('--unique', type=int, default=1000, help='distinct contents to cycle through')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--web-workers', type=int, default=4)
+    parser.add_argument('--web-threads', type=int, default=4)
+    parser.add_argument('--worker-concurrency', type=int, default=8)
+    parser.add_argument('--no-worker', action='store_true', help='use an already running Celery worker')
+    parser.add_argument('--drain-timeout', type=float, default=120)
+    parser.add_argument('--latency', type=float, default=0.05, help='mean stub latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--token-latency', type=float, default=0.0, help='stub model seconds per generated token')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of 429 responses')
+    parser.add_argument('--save-baseline', help='write the report to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON report and fail on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    stub = start_stub_server(StubConfig(args.latency, args.jitter, args.error_rate, args.throttle_rate,
+                                         token_latency=args.token_latency))
+    env = dict(os.environ, **stub_environment(stub), RATE_LIMIT_REQUESTS=str(10 ** 9), CACHE_TYPE='RedisCache')
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    processes = start_processes(args, env)
+    try:
+        wait_until_up(base_url)
+        latencies, statuses, crosspost_ids, elapsed = drive_load(base_url, args)
+        done_tasks, unfinished, drain_elapsed = drain_tasks(base_url, crosspost_ids, args.drain_timeout)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+        stub.shutdown()
+
+    report = {
+        "requests": len(latencies),
+        "statuses": statuses,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "requests_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "tasks_per_sec": done_tasks / (elapsed + drain_elapsed) if done_tasks else 0.0,
+        "unfinished_crossposts": unfinished,
+        "upstream_calls": dict(stub.RequestHandlerClass.counts),
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# app/benchmarks/stubs.py
+
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+PLATFORM_LIMITS = {"Twitter": 280, "Threads": 500, "LinkedIn": 1300}
+
+FILLER = [
+    "Share it with someone who needs to hear this.",
+    "What would you add?",
+    "More details are coming soon.",
+    "Let us know what you think in the replies!",
+]
+
+class StubConfig:
+    """Behaviour shared by all stub endpoints."""
+
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, throttle_rate=0.0, retry_after=1,
+                 token_latency=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        # Seconds the stub model spends on each generated token
+        self.token_latency = token_latency
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers Twitter, LinkedIn, Threads and Anthropic API calls with canned data."""
+
+    protocol_version = 'HTTP/1.1'
+    stub = StubConfig()
+    counts: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _count(self, name, value=1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def _stream(self, tokens, model):
+        """Sends tokens as server-sent completion events until done or the client hangs up."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for i, token in enumerate(tokens):
+                time.sleep(self.stub.token_latency)
+                last = i == len(tokens) - 1
+                event = {"type": "completion", "completion": token,
+                         "stop_reason": "max_tokens" if last else None, "model": model}
+                self.wfile.write(f"event: completion\ndata: {json.dumps(event)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                self._count('anthropic_tokens')
+        except (BrokenPipeError, ConnectionResetError):
+            self._count('anthropic_streams_cancelled')
+
+    def _simulate(self, service):
+        """Applies latency and error/429 injection; returns True if a fault was sent."""
+        self._count(service)
+        time.sleep(max(random.gauss(self.stub.latency, self.stub.jitter), 0))
+        roll = random.random()
+        if roll < self.stub.throttle_rate:
+            self._send(429, {"error": "rate limited"}, {
+                "Retry-After": str(self.stub.retry_after),
+                "x-rate-limit-remaining": "0",
+                "x-rate-limit-reset": str(int(time.time()) + self.stub.retry_after)
+            })
+            return True
+        if roll < self.stub.throttle_rate + self.stub.error_rate:
+            self._send(500, {"error": "injected failure"})
+            return True
+        return False
+
+    def do_POST(self):
+        body = self._read_json()
+        if self.path.startswith('/v1/complete'):
+            if self._simulate('anthropic'):
+                return
+            tokens = self._tokens(self._completion(body.get("prompt", ""), body.get("max_tokens_to_sample", 150)))
+            if body.get("stream"):
+                return self._stream(tokens, body.get("model", "stub"))
+            self._count('anthropic_tokens', len(tokens))
+            time.sleep(self.stub.token_latency * len(tokens))
+            return self._send(200, {
+                "completion": "".join(tokens),
+                "stop_reason": "max_tokens",
+                "model": body.get("model", "stub")
+            })
+        if self.path.startswith('/2/tweets'):
+            if self._simulate('twitter'):
+                return
+            return self._send(201, {"data": {"id": uuid.uuid4().hex, "text": body.get("text", "")}}, {
+                "x-rate-limit-remaining": "100000",
+                "x-rate-limit-reset": str(int(time.time()) + 900)
+            })
+        if self.path.startswith('/v2/ugcPosts'):
+            if self._simulate('linkedin'):
+                return
+            return self._send(201, {"id": f"urn:li:share:{uuid.uuid4().int % 10 ** 12}"})
+        if self.path.startswith('/v1/threads'):
+            if self._simulate('threads'):
+                return
+            return self._send(200, {"id": uuid.uuid4().hex})
+        self._send(404, {"error": "unknown endpoint"})
+
+    def do_GET(self):
+        if self.path.startswith('/v1/threads'):
+            if self._simulate('threads'):
+                return
+            if '/insights' in self.path:
+                return self._send(200, {"data": [{"name": "views", "values": [{"value": random.randint(0, 10000)}]}]})
+            return self._send(200, {"data": [{"id": uuid.uuid4().hex, "text": "reply"} for _ in range(25)]})
+        self._send(404, {"error": "unknown endpoint"})
+
+    def do_DELETE(self):
+        if self._simulate('threads'):
+            return
+        self._send(200, {"success": True})
+
+    @staticmethod
+    def _completion(prompt, max_tokens):
+        """Echoes the content and, like a real model, keeps writing until max_tokens."""
+        content = prompt.rsplit("Content:", 1)[-1].strip()
+        if "JSON object" in prompt:
+            platforms = [p for p in PLATFORM_LIMITS if f"{p}:" in prompt]
+            return json.dumps({p: content[:PLATFORM_LIMITS[p]] for p in platforms})
+        text = " " + content
+        while len(text) < max_tokens * 4:
+            text += " " + random.choice(FILLER)
+        return text[:max_tokens * 4]
+
+    @staticmethod
+    def _tokens(text):
+        """Splits text into four-character tokens."""
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+def start_stub_server(stub: StubConfig, host='127.0.0.1', port=0) -> ThreadingHTTPServer:
+    """Starts the stub server on a daemon thread and returns it."""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'stub': stub, 'counts': {}})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-server', daemon=True).start()
+    return server
+
+def stub_environment(server: ThreadingHTTPServer) -> Dict[str, str]:
+    """Environment variables that point the app's outbound calls at the stub server."""
+    base = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    return {
+        "THREADS_API_URL": f"{base}/v1/threads",
+        "TWITTER_API_URL": f"{base}/2/tweets",
+        "LINKEDIN_API_URL": f"{base}/v2/ugcPosts",
+        "ANTHROPIC_BASE_URL": base,
+        "ANTHROPIC_API_KEY": "stub-key",
+        "THREADS_ACCESS_TOKEN": "stub-token",
+        "TWITTER_ACCESS_TOKEN": "stub-token",
+        "LINKEDIN_ACCESS_TOKEN": "stub-token",
+    }
@@ -0,0 +1,111 @@
+# app/cache.py
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict
+import redis
+from redis.exceptions import RedisError
+from flask_caching import Cache
+from .lazy import LazyClient
+from .metrics import optimize_cache_lookups
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Flask-Caching extension, bound to the app in create_app
+cache = Cache()
+
+class OptimizationCache:
+    """Two-level cache for optimized content shared by web and worker processes.
+
+    A small in-process LRU (L1) sits in front of Redis (L2). L2 entries expire
+    after ``ttl`` seconds and the oldest entries are evicted once more than
+    ``max_entries`` are stored.
+    """
+
+    KEY_PREFIX = "optimize_cache"
+
+    def __init__(self, redis_url, ttl, max_entries, l1_size, l1_ttl):
+        self.redis = LazyClient(lambda: redis.StrictRedis.from_url(redis_url))
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.l1_size = l1_size
+        self.l1_ttl = l1_ttl
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(content: str, platform: str, prompt: str, model: str) -> str:
+        """Builds a cache key from everything that influences the completion."""
+        payload = json.dumps([content, platform, prompt, model])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry and entry[1] > now:
+                self._l1.move_to_end(key)
+                self.l1_hits += 1
+                optimize_cache_lookups.inc(result='l1_hit')
+                return entry[0]
+            self._l1.pop(key, None)
+
+        try:
+            value = self.redis.get(f"{self.KEY_PREFIX}:{key}")
+        except RedisError as e:
+            logger.error(f"Redis error in optimization cache: {str(e)}")
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                optimize_cache_lookups.inc(result='miss')
+                return None
+            self.l2_hits += 1
+        optimize_cache_lookups.inc(result='l2_hit')
+        value = value.decode('utf-8')
+        self._set_l1(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._set_l1(key, value)
+        index = f"{self.KEY_PREFIX}:index"
+        now = time.time()
+        try:
+            pipe = self.redis.pipeline()
+            pipe.set(f"{self.KEY_PREFIX}:{key}", value, ex=self.ttl)
+            pipe.zadd(index, {key: now})
+            pipe.zremrangebyscore(index, '-inf', now - self.ttl)
+            pipe.zcard(index)
+            size = pipe.execute()[-1]
+
+            if size > self.max_entries:
+                evicted = self.redis.zpopmin(index, size - self.max_entries)
+                if evicted:
+                    self.redis.delete(*[f"{self.KEY_PREFIX}:{member.decode('utf-8')}" for member, _ in evicted])
+        except RedisError as e:
+            logger.error(f"Redis error in optimization cache: {str(e)}")
+
+    def _set_l1(self, key: str, value: str) -> None:
+        with self._lock:
+            self._l1[key] = (value, time.monotonic() + self.l1_ttl)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_size:
+                self._l1.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss counters for this process."""
+        with self._lock:
+            return {
+                "l1_hits": self.l1_hits,
+                "l2_hits": self.l2_hits,
+                "misses": self.misses,
+                "l1_size": len(self._l1)
+            }
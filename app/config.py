@@ -11,6 +11,12 @@ class Config:
     THREADS_APP_SECRET = os.getenv('THREADS_APP_SECRET')
     THREADS_ACCESS_TOKEN = os.getenv('THREADS_ACCESS_TOKEN')
     THREADS_API_URL = os.getenv('THREADS_API_URL', 'https://api.threads.com/v1/threads')
+    THREADS_UPLOAD_URL = os.getenv('THREADS_UPLOAD_URL', 'https://graph.facebook.com/v19.0')
+    THREADS_ASYNC_CONCURRENCY = int(os.getenv('THREADS_ASYNC_CONCURRENCY', '20'))
+    THREADS_BULK_MAX_IDS = int(os.getenv('THREADS_BULK_MAX_IDS', '500'))
+    THREADS_REPLIES_CACHE_TTL = int(os.getenv('THREADS_REPLIES_CACHE_TTL', '30'))
+    THREADS_INSIGHTS_CACHE_TTL = int(os.getenv('THREADS_INSIGHTS_CACHE_TTL', '300'))
+    THREADS_CACHE_STALE_TTL = int(os.getenv('THREADS_CACHE_STALE_TTL', '600'))
 
     # Twitter API
     TWITTER_API_KEY = os.getenv('TWITTER_API_KEY')
@@ -18,18 +24,102 @@ class Config:
     TWITTER_ACCESS_TOKEN = os.getenv('TWITTER_ACCESS_TOKEN')
     TWITTER_ACCESS_TOKEN_SECRET = os.getenv('TWITTER_ACCESS_TOKEN_SECRET')
     TWITTER_API_URL = os.getenv('TWITTER_API_URL', 'https://api.twitter.com/2/tweets')
+    TWITTER_MEDIA_UPLOAD_URL = os.getenv('TWITTER_MEDIA_UPLOAD_URL', 'https://upload.twitter.com/1.1/media/upload.json')
+    TWITTER_MEDIA_METADATA_URL = os.getenv('TWITTER_MEDIA_METADATA_URL',
+                                           'https://upload.twitter.com/1.1/media/metadata/create.json')
 
     # LinkedIn API
     LINKEDIN_ACCESS_TOKEN = os.getenv('LINKEDIN_ACCESS_TOKEN')
     LINKEDIN_PERSON_URN = os.getenv('LINKEDIN_PERSON_URN')
     LINKEDIN_API_URL = os.getenv('LINKEDIN_API_URL', 'https://api.linkedin.com/v2/ugcPosts')
+    LINKEDIN_ASSETS_URL = os.getenv('LINKEDIN_ASSETS_URL', 'https://api.linkedin.com/v2/assets')
 
     # Anthropic API
     ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
+    ANTHROPIC_MODEL = os.getenv('ANTHROPIC_MODEL', 'claude-3.5-sonnet')
+    ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BASE_URL') or None
+
+    # Content Optimization
+    OPTIMIZE_MAX_WORKERS = int(os.getenv('OPTIMIZE_MAX_WORKERS', '16'))
+    OPTIMIZE_TIMEOUT = float(os.getenv('OPTIMIZE_TIMEOUT', '8'))
+    OPTIMIZE_IN_WORKER = os.getenv('OPTIMIZE_IN_WORKER', 'true').lower() == 'true'
+    CROSSPOST_BATCH_MAX_SIZE = int(os.getenv('CROSSPOST_BATCH_MAX_SIZE', '500'))
+    CROSSPOST_DEDUP_WINDOW = int(os.getenv('CROSSPOST_DEDUP_WINDOW', '600'))  # seconds; 0 disables content-hash dedup
+    IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))
+    IDEMPOTENCY_PENDING_TTL = int(os.getenv('IDEMPOTENCY_PENDING_TTL', '60'))
+    OPTIMIZE_BATCH_MODE = os.getenv('OPTIMIZE_BATCH_MODE', 'true').lower() == 'true'
+    OPTIMIZE_FALLBACK_RESERVE = float(os.getenv('OPTIMIZE_FALLBACK_RESERVE', '0.3'))  # share of the deadline kept for per-platform fallback
+    OPTIMIZE_STREAM = os.getenv('OPTIMIZE_STREAM', 'true').lower() == 'true'
+    OPTIMIZE_STREAM_MIN_TAIL = int(os.getenv('OPTIMIZE_STREAM_MIN_TAIL', '40'))  # chars; stop at a sentence end with less room left
+    OPTIMIZE_CACHE_TTL = int(os.getenv('OPTIMIZE_CACHE_TTL', '86400'))
+    OPTIMIZE_CACHE_MAX_ENTRIES = int(os.getenv('OPTIMIZE_CACHE_MAX_ENTRIES', '100000'))
+    OPTIMIZE_CACHE_L1_SIZE = int(os.getenv('OPTIMIZE_CACHE_L1_SIZE', '1024'))
+    OPTIMIZE_CACHE_L1_TTL = int(os.getenv('OPTIMIZE_CACHE_L1_TTL', '300'))
+    NEAR_DUP_ENABLED = os.getenv('NEAR_DUP_ENABLED', 'true').lower() == 'true'
+    NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', '0.95'))  # SimHash similarity needed to reuse a variant
+    NEAR_DUP_TTL = int(os.getenv('NEAR_DUP_TTL', '2592000'))
+    NEAR_DUP_BUCKET_SIZE = int(os.getenv('NEAR_DUP_BUCKET_SIZE', '32'))
+    NEAR_DUP_MAX_EDITS = int(os.getenv('NEAR_DUP_MAX_EDITS', '6'))  # changed words that may be patched into a variant
+    # auto: skip the LLM when the content already fits, local: never call it, llm: always call it
+    TWITTER_OPTIMIZE_POLICY = os.getenv('TWITTER_OPTIMIZE_POLICY', 'auto')
+    THREADS_OPTIMIZE_POLICY = os.getenv('THREADS_OPTIMIZE_POLICY', 'auto')
+    LINKEDIN_OPTIMIZE_POLICY = os.getenv('LINKEDIN_OPTIMIZE_POLICY', 'auto')
+
+    # Content Validation
+    SUPPORTED_LANGUAGES = os.getenv('SUPPORTED_LANGUAGES', 'en,es,fr,de')
+    PROHIBITED_WORDS = os.getenv('PROHIBITED_WORDS', 'badword1,badword2')
+    PROHIBITED_WORDS_FILE = os.getenv('PROHIBITED_WORDS_FILE')
+    LANGDETECT_MIN_LENGTH = int(os.getenv('LANGDETECT_MIN_LENGTH', '20'))
+    LANGDETECT_CACHE_SIZE = int(os.getenv('LANGDETECT_CACHE_SIZE', '4096'))
+
+    # Media attachments
+    MEDIA_ROOT = os.getenv('MEDIA_ROOT', '/media')  # shared by the web tier and the post workers
+    MEDIA_MAX_ITEMS = int(os.getenv('MEDIA_MAX_ITEMS', '4'))
+    MEDIA_MAX_BYTES = int(os.getenv('MEDIA_MAX_BYTES', str(512 * 1024 * 1024)))
+    MEDIA_CHUNK_SIZE = int(os.getenv('MEDIA_CHUNK_SIZE', str(4 * 1024 * 1024)))
+    MEDIA_UPLOAD_CONCURRENCY = int(os.getenv('MEDIA_UPLOAD_CONCURRENCY', '4'))
+    MEDIA_UPLOAD_CACHE_TTL = int(os.getenv('MEDIA_UPLOAD_CACHE_TTL', '82800'))
+    MEDIA_PROCESSING_TIMEOUT = float(os.getenv('MEDIA_PROCESSING_TIMEOUT', '300'))  # seconds a parked post waits for media processing
+
+    # Outbound HTTP connection pools
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '4'))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '32'))
+    HTTP_POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'false').lower() == 'true'
+    HTTP_KEEPALIVE = os.getenv('HTTP_KEEPALIVE', 'true').lower() == 'true'
+
+    # Scheduled posts
+    SCHEDULER_INTERVAL = float(os.getenv('SCHEDULER_INTERVAL', '5'))  # seconds between dispatcher runs
+    SCHEDULER_BATCH_SIZE = int(os.getenv('SCHEDULER_BATCH_SIZE', '500'))
+    SCHEDULER_MAX_BATCHES = int(os.getenv('SCHEDULER_MAX_BATCHES', '20'))
+    SCHEDULER_LEASE = int(os.getenv('SCHEDULER_LEASE', '120'))
+    SCHEDULE_MAX_DAYS_AHEAD = int(os.getenv('SCHEDULE_MAX_DAYS_AHEAD', '365'))
+
+    # Threads insights warehouse
+    INSIGHTS_DB_PATH = os.getenv('INSIGHTS_DB_PATH', '/data/insights.db')
+    INSIGHTS_HARVEST_INTERVAL = float(os.getenv('INSIGHTS_HARVEST_INTERVAL', '300'))  # seconds between harvests
+    INSIGHTS_HARVEST_BATCH = int(os.getenv('INSIGHTS_HARVEST_BATCH', '500'))  # threads fetched per harvest
+    INSIGHTS_MIN_REFRESH = int(os.getenv('INSIGHTS_MIN_REFRESH', '3600'))
+    INSIGHTS_MAX_REFRESH = int(os.getenv('INSIGHTS_MAX_REFRESH', '604800'))
+    INSIGHTS_MAX_AGE_DAYS = int(os.getenv('INSIGHTS_MAX_AGE_DAYS', '90'))  # threads are not refreshed after this
+
+    # Post retries and circuit breaking
+    POST_MAX_RETRIES = int(os.getenv('POST_MAX_RETRIES', '3'))
+    POST_RETRY_BASE_DELAY = float(os.getenv('POST_RETRY_BASE_DELAY', '5'))
+    POST_RETRY_MAX_DELAY = float(os.getenv('POST_RETRY_MAX_DELAY', '300'))
+    RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', '0.2'))  # retries allowed per request
+    RETRY_BUDGET_MIN = int(os.getenv('RETRY_BUDGET_MIN', '10'))
+    RETRY_BUDGET_WINDOW = int(os.getenv('RETRY_BUDGET_WINDOW', '60'))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_FAILURE_WINDOW = float(os.getenv('CIRCUIT_FAILURE_WINDOW', '60'))
+    CIRCUIT_COOLDOWN = float(os.getenv('CIRCUIT_COOLDOWN', '30'))
+    CIRCUIT_PROBE_TIMEOUT = float(os.getenv('CIRCUIT_PROBE_TIMEOUT', '15'))
 
     # Rate Limiting
     RATE_LIMIT_REQUESTS = int(os.getenv('RATE_LIMIT_REQUESTS', '100'))
     RATE_LIMIT_WINDOW = int(os.getenv('RATE_LIMIT_WINDOW', '3600'))
+    RATE_LIMIT_ALGORITHM = os.getenv('RATE_LIMIT_ALGORITHM', 'sliding_window')  # sliding_log, sliding_window or gcra
+    RATE_LIMIT_LEASE_SIZE = int(os.getenv('RATE_LIMIT_LEASE_SIZE', '10'))  # tokens reserved per process; 1 disables leasing
+    RATE_LIMIT_LEASE_TTL = float(os.getenv('RATE_LIMIT_LEASE_TTL', '5'))
 
     # Redis Configuration
     REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
@@ -37,9 +127,15 @@ class Config:
     # Celery Configuration
     CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', REDIS_URL)
     CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', REDIS_URL)
+    CELERY_PREFETCH_MULTIPLIER = int(os.getenv('CELERY_PREFETCH_MULTIPLIER', '1'))
 
     # Sentry
     SENTRY_DSN = os.getenv('SENTRY_DSN')
+    SENTRY_TRACES_SAMPLE_RATE = float(os.getenv('SENTRY_TRACES_SAMPLE_RATE', '0.05'))
+
+    # Metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
 
     # Flask-Caching
     CACHE_TYPE = os.getenv('CACHE_TYPE', 'redis')
@@ -0,0 +1,16 @@
+# app/gunicorn.conf.py
+
+import importlib
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+
+# Import the app once in the master and fork workers from it
+preload_app = True
+
+def on_starting(server):
+    """Warms shared state in the master so every worker starts ready."""
+    package = server.app.wsgi().import_name
+    importlib.import_module(f"{package}.preload").warm_up()
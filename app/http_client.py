@@ -0,0 +1,135 @@
+# app/http_client.py
+
+import os
+import socket
+import threading
+from typing import Dict, Any
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .config import Config
+from .metrics import platform_responses
+import logging
+
+logger = logging.getLogger(__name__)
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that enables TCP keep-alive on pooled connections."""
+
+    def __init__(self, keepalive=True, **kwargs):
+        self.keepalive = keepalive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.keepalive:
+            kwargs['socket_options'] = [
+                (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super().init_poolmanager(*args, **kwargs)
+
+class HTTPClientRegistry:
+    """Long-lived requests sessions, one per platform and worker process.
+
+    Sessions are rebuilt lazily in forked children so pooled sockets are
+    never shared between processes.
+    """
+
+    def __init__(self, pool_connections, pool_maxsize, pool_block, keepalive):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._pid = os.getpid()
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset)
+
+    def get(self, platform: str) -> requests.Session:
+        """Returns the pooled session for a platform, creating it on first use."""
+        if os.getpid() != self._pid:
+            self.reset()
+        session = self._sessions.get(platform)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(platform)
+                if session is None:
+                    session = self._create_session()
+                    session.hooks['response'].append(self._response_hook(platform))
+                    self._sessions[platform] = session
+        return session
+
+    @staticmethod
+    def _response_hook(platform: str):
+        def record(response, *args, **kwargs):
+            platform_responses.inc(platform=platform, status=response.status_code)
+        return record
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        # Only idempotent reads are retried here; posts are retried by the
+        # Celery tasks under the platform's RetryPolicy and retry budget
+        retry = Retry(
+            total=2,
+            backoff_factor=0.3,
+            status_forcelist=(500, 502, 504),
+            allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS'])
+        )
+        adapter = KeepAliveHTTPAdapter(
+            keepalive=self.keepalive,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=retry
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not self.keepalive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def reset(self) -> None:
+        """Drops all sessions without closing sockets inherited from a parent."""
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._pid = os.getpid()
+
+    def close(self) -> None:
+        """Closes all sessions owned by this process."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    def stats(self) -> Dict[str, Any]:
+        """Reports connection reuse and pool saturation per platform."""
+        stats = {}
+        for platform, session in list(self._sessions.items()):
+            created = requests_sent = in_use = capacity = 0
+            for adapter in set(session.adapters.values()):
+                for key in adapter.poolmanager.pools.keys():
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool is None:
+                        continue
+                    created += pool.num_connections
+                    requests_sent += pool.num_requests
+                    capacity += pool.pool.maxsize if pool.pool else 0
+                    in_use += (pool.pool.maxsize - pool.pool.qsize()) if pool.pool else 0
+            stats[platform] = {
+                "connections_created": created,
+                "requests": requests_sent,
+                "connections_reused": max(requests_sent - created, 0),
+                "in_use": in_use,
+                "saturation": round(in_use / capacity, 3) if capacity else 0.0
+            }
+        return stats
+
+# Process-wide registry used by every outbound platform call
+http_clients = HTTPClientRegistry(
+    Config.HTTP_POOL_CONNECTIONS,
+    Config.HTTP_POOL_MAXSIZE,
+    Config.HTTP_POOL_BLOCK,
+    Config.HTTP_KEEPALIVE
+)
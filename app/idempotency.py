@@ -0,0 +1,87 @@
+# app/idempotency.py
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+import redis
+from redis.exceptions import RedisError
+from .config import Config
+from .lazy import LazyClient
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+COMPLETED = "completed"
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.strip().encode('utf-8')).hexdigest()
+
+class IdempotencyStore:
+    """Remembers cross-post responses by Idempotency-Key or content hash.
+
+    A request claims its key with SET NX before doing any work. Concurrent
+    duplicates see the pending claim, and later duplicates get the stored
+    response until the key expires. A claim is released when the request
+    fails, so the client can retry.
+    """
+
+    KEY_PREFIX = "idempotency"
+
+    def __init__(self, redis_url, key_ttl, dedup_window, pending_ttl):
+        self.redis = LazyClient(lambda: redis.StrictRedis.from_url(redis_url))
+        self.key_ttl = key_ttl
+        self.dedup_window = dedup_window
+        self.pending_ttl = pending_ttl
+
+    def make_key(self, client_id: str, idempotency_key: Optional[str], content: str) -> Optional[str]:
+        """Returns the Redis key for a request, or None when dedup does not apply."""
+        if idempotency_key:
+            digest = hashlib.sha256(idempotency_key.encode('utf-8')).hexdigest()
+            return f"{self.KEY_PREFIX}:{client_id}:key:{digest}"
+        if self.dedup_window > 0:
+            return f"{self.KEY_PREFIX}:{client_id}:content:{content_hash(content)}"
+        return None
+
+    def _ttl(self, key: str) -> int:
+        return self.key_ttl if ":key:" in key else self.dedup_window
+
+    def claim(self, key: str, content: str) -> Optional[Dict[str, Any]]:
+        """Claims a key for this request.
+
+        Returns None if the claim succeeded, otherwise the existing record
+        whose ``state`` is pending or completed.
+        """
+        record = json.dumps({"state": PENDING, "content_hash": content_hash(content)})
+        try:
+            for _ in range(2):
+                if self.redis.set(key, record, nx=True, ex=self.pending_ttl):
+                    return None
+                existing = self.redis.get(key)
+                if existing is not None:
+                    return json.loads(existing)
+        except RedisError as e:
+            logger.error(f"Redis error in idempotency store: {str(e)}")
+        return None
+
+    def complete(self, key: str, content: str, response: Dict[str, Any]) -> None:
+        """Stores the response returned to the request that owns the claim."""
+        record = json.dumps({"state": COMPLETED, "content_hash": content_hash(content), "response": response})
+        try:
+            self.redis.set(key, record, ex=self._ttl(key))
+        except RedisError as e:
+            logger.error(f"Redis error in idempotency store: {str(e)}")
+
+    def release(self, key: str) -> None:
+        """Drops a pending claim so the request can be retried."""
+        try:
+            self.redis.delete(key)
+        except RedisError as e:
+            logger.error(f"Redis error in idempotency store: {str(e)}")
+
+idempotency_store = IdempotencyStore(
+    Config.REDIS_URL,
+    Config.IDEMPOTENCY_KEY_TTL,
+    Config.CROSSPOST_DEDUP_WINDOW,
+    Config.IDEMPOTENCY_PENDING_TTL
+)
@@ -0,0 +1,210 @@
+# app/insights.py
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    created_at INTEGER NOT NULL,
+    next_harvest_at INTEGER,
+    refresh_interval INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS threads_next_harvest ON threads (next_harvest_at);
+CREATE INDEX IF NOT EXISTS threads_created ON threads (created_at);
+
+CREATE TABLE IF NOT EXISTS latest (
+    thread_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (metric, thread_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS samples (
+    metric TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    thread_id TEXT NOT NULL,
+    value REAL NOT NULL,
+    delta REAL NOT NULL,
+    PRIMARY KEY (metric, ts, thread_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS samples_thread ON samples (thread_id, ts);
+"""
+
+INTERVALS = {"hour": 3600, "day": 86400, "week": 604800}
+
+def parse_timestamp(value: str) -> int:
+    """Unix time of a Threads API timestamp such as 2024-07-01T12:00:00+0000."""
+    return int(datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z").timestamp())
+
+def parse_insights(body: Dict[str, Any]) -> Dict[str, float]:
+    """Extracts the numeric lifetime value of every metric in an insights response."""
+    metrics = {}
+    for item in (body or {}).get("data", []):
+        name = item.get("name")
+        value = (item.get("total_value") or {}).get("value")
+        if value is None and item.get("values"):
+            value = item["values"][-1].get("value")
+        if name and isinstance(value, (int, float)):
+            metrics[name] = float(value)
+    return metrics
+
+class InsightsWarehouse:
+    """Thread insights kept in a local SQLite database for aggregate queries.
+
+    The harvester records a sample per metric only when its value changed,
+    with the change since the previous sample, so time series are sums of
+    deltas and totals come from the latest value per thread. Each thread is
+    refreshed on an interval of 1/24th of its age, bounded by
+    ``min_refresh`` and ``max_refresh`` and doubled while its metrics stay
+    unchanged; threads older than ``max_age`` seconds are no longer fetched.
+    """
+
+    def __init__(self, path, min_refresh, max_refresh, max_age):
+        self.path = path
+        self.min_refresh = min_refresh
+        self.max_refresh = max_refresh
+        self.max_age = max_age
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns this thread's connection, creating the database on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _refresh_interval(self, age: float, previous: Optional[int] = None, changed: bool = True) -> int:
+        interval = min(max(age / 24, self.min_refresh), self.max_refresh)
+        if previous and not changed:
+            interval = max(interval, min(previous * 2, self.max_refresh))
+        return int(interval)
+
+    def add_threads(self, threads: Iterable[Tuple[str, float]]) -> int:
+        """Registers (thread ID, creation time) pairs; returns how many were new."""
+        now = time.time()
+        rows = [(thread_id, int(created_at), int(now), self.min_refresh) for thread_id, created_at in threads]
+        conn = self._connect()
+        with conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO threads VALUES (?, ?, ?, ?)", rows)
+            return conn.total_changes - before
+
+    def latest_created_at(self) -> Optional[int]:
+        return self._connect().execute("SELECT MAX(created_at) FROM threads").fetchone()[0]
+
+    def due_threads(self, limit: int, now: Optional[float] = None) -> List[str]:
+        """Returns the threads whose next refresh is due, most overdue first."""
+        now = time.time() if now is None else now
+        rows = self._connect().execute(
+            "SELECT thread_id FROM threads WHERE next_harvest_at <= ? ORDER BY next_harvest_at LIMIT ?",
+            (int(now), limit)
+        )
+        return [row[0] for row in rows]
+
+    def record(self, results: Dict[str, Dict[str, Any]], now: Optional[float] = None) -> int:
+        """Stores harvested insights and schedules each thread's next refresh.
+
+        Threads whose fetch failed are retried after ``min_refresh``. Returns
+        the number of samples written.
+        """
+        now = int(time.time() if now is None else now)
+        conn = self._connect()
+        written = 0
+        with conn:
+            for thread_id, body in results.items():
+                row = conn.execute("SELECT created_at, refresh_interval FROM threads WHERE thread_id = ?",
+                                   (thread_id,)).fetchone()
+                if row is None:
+                    continue
+                created_at, previous = row
+                if "error" in body:
+                    conn.execute("UPDATE threads SET next_harvest_at = ? WHERE thread_id = ?",
+                                 (now + self.min_refresh, thread_id))
+                    continue
+
+                latest = dict(conn.execute("SELECT metric, value FROM latest WHERE thread_id = ?", (thread_id,)))
+                samples = [
+                    (metric, now, thread_id, value, value - latest.get(metric, 0.0))
+                    for metric, value in parse_insights(body).items() if latest.get(metric) != value
+                ]
+                conn.executemany("INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?)", samples)
+                conn.executemany("INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?)",
+                                 [(thread_id, metric, value, now) for metric, _, _, value, _ in samples])
+                written += len(samples)
+
+                age = now - created_at
+                interval = self._refresh_interval(age, previous, changed=bool(samples))
+                next_harvest = now + interval if age + interval <= self.max_age else None
+                conn.execute("UPDATE threads SET next_harvest_at = ?, refresh_interval = ? WHERE thread_id = ?",
+                             (next_harvest, interval, thread_id))
+        return written
+
+    def summary(self, metric: str, start: Optional[float] = None, end: Optional[float] = None,
+                interval: str = "day", top: int = 10, thread_id: Optional[str] = None) -> Dict[str, Any]:
+        """Aggregates stored insights without calling the Threads API.
+
+        ``totals`` and ``top`` cover the threads published between start and
+        end; ``series`` sums each bucket's growth of ``metric`` in that range.
+        """
+        start = int(start) if start is not None else 0
+        end = int(end) if end is not None else 2 ** 62
+        bucket = INTERVALS[interval]
+        conn = self._connect()
+
+        thread_filter, params = "t.created_at BETWEEN ? AND ?", [start, end]
+        if thread_id:
+            thread_filter, params = "t.thread_id = ?", [thread_id]
+
+        totals = {
+            name: total for name, total in conn.execute(
+                f"SELECT l.metric, SUM(l.value) FROM latest l JOIN threads t ON t.thread_id = l.thread_id "
+                f"WHERE {thread_filter} GROUP BY l.metric", params)
+        }
+        threads, harvested_at = conn.execute(
+            f"SELECT COUNT(*), (SELECT MAX(updated_at) FROM latest) FROM threads t WHERE {thread_filter}", params
+        ).fetchone()
+
+        series_filter, series_params = "", []
+        if thread_id:
+            series_filter, series_params = " AND thread_id = ?", [thread_id]
+        series = conn.execute(
+            f"SELECT ts / ? * ? AS bucket, SUM(delta) FROM samples WHERE metric = ? AND ts BETWEEN ? AND ?"
+            f"{series_filter} GROUP BY bucket ORDER BY bucket",
+            [bucket, bucket, metric, start, end] + series_params
+        ).fetchall()
+
+        top_threads = conn.execute(
+            f"SELECT l.thread_id, l.value FROM latest l JOIN threads t ON t.thread_id = l.thread_id "
+            f"WHERE l.metric = ? AND {thread_filter} ORDER BY l.value DESC LIMIT ?", [metric] + params + [top]
+        ).fetchall()
+
+        return {
+            "threads": threads,
+            "totals": totals,
+            "series": [{"t": ts, "value": value} for ts, value in series],
+            "top": [{"thread_id": tid, "value": value} for tid, value in top_threads],
+            "harvested_at": harvested_at
+        }
+
+insights_warehouse = InsightsWarehouse(
+    Config.INSIGHTS_DB_PATH,
+    Config.INSIGHTS_MIN_REFRESH,
+    Config.INSIGHTS_MAX_REFRESH,
+    Config.INSIGHTS_MAX_AGE_DAYS * 86400
+)
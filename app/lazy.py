@@ -0,0 +1,50 @@
+# app/lazy.py
+
+import os
+import threading
+from typing import Any, Callable
+
+class LazyClient:
+    """Proxy that builds a client on first use, once per process.
+
+    Nothing is created at import time, and a forked child builds its own
+    client instead of reusing sockets or pools created by the parent.
+    Attribute access and calls are forwarded to the underlying client, so the
+    proxy defines no public names of its own besides ``initialized``.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._reset()
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = os.getpid()
+
+    @property
+    def initialized(self) -> bool:
+        return self._client is not None and self._pid == os.getpid()
+
+    def _resolve(self) -> Any:
+        """Returns the client for this process, creating it if needed."""
+        if self._pid != os.getpid():
+            self._reset()
+        client = self._client
+        if client is None:
+            with self._lock:
+                client = self._client
+                if client is None:
+                    client = self._client = self._factory()
+        return client
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._resolve()(*args, **kwargs)
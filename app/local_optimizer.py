@@ -0,0 +1,97 @@
+# app/local_optimizer.py
+
+import re
+from typing import List, Optional, Tuple
+
+# How optimize_content treats a platform: 'auto' formats content locally when
+# it already fits, 'local' never calls the LLM and 'llm' always does
+POLICY_AUTO = "auto"
+POLICY_LOCAL = "local"
+POLICY_LLM = "llm"
+POLICIES = (POLICY_AUTO, POLICY_LOCAL, POLICY_LLM)
+
+ELLIPSIS = "…"
+SENTENCE_ENDINGS = (".", "!", "?", "…")
+
+_HASHTAG = re.compile(r"#\w+")
+_TRAILING_TAGS = re.compile(r"(?:\s*#\w+)+\s*$")
+_INLINE_SPACE = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_SENTENCE_END = re.compile(r"[.!?…][\"')\]]*(?=\s)")
+
+def normalize_whitespace(content: str) -> str:
+    """Collapses runs of spaces and blank lines and trims every line."""
+    lines = [_INLINE_SPACE.sub(" ", line).strip() for line in content.strip().splitlines()]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines))
+
+def split_hashtags(content: str) -> Tuple[str, List[str]]:
+    """Splits the trailing block of hashtags off the content.
+
+    Hashtags used inside the text are left in place, and any trailing tag
+    repeating one of them is dropped.
+    """
+    match = _TRAILING_TAGS.search(content)
+    if not match or match.start() == 0:
+        return content, []
+    body = content[:match.start()].rstrip()
+    seen = {tag.lower() for tag in _HASHTAG.findall(body)}
+    tags = []
+    for tag in _HASHTAG.findall(match.group()):
+        if tag.lower() not in seen:
+            seen.add(tag.lower())
+            tags.append(tag)
+    return body, tags
+
+def smart_truncate(content: str, limit: int) -> str:
+    """Shortens content to at most ``limit`` characters.
+
+    Cuts after the last complete sentence when that keeps at least half of
+    the allowed length, otherwise at the last word boundary with an ellipsis.
+    """
+    if len(content) <= limit:
+        return content
+    if limit <= 1:
+        return content[:limit]
+
+    window = content[:limit + 1]
+    ends = [m.end() for m in _SENTENCE_END.finditer(window) if m.end() <= limit]
+    if ends and ends[-1] >= limit // 2:
+        return content[:ends[-1]]
+
+    cut = window[:limit - len(ELLIPSIS)].rstrip()
+    space = cut.rfind(" ")
+    if space >= limit // 2:
+        cut = cut[:space]
+    return cut.rstrip(" ,;:-") + ELLIPSIS
+
+def format_for_platform(content: str, max_length: int, max_hashtags: int, hashtag_separator: str) -> Tuple[str, bool]:
+    """Formats content for a platform without the LLM.
+
+    Returns (content, truncated). Trailing hashtags are placed after
+    ``hashtag_separator``. When they do not all fit, only the first
+    ``max_hashtags`` are kept, and they are dropped first when the text
+    itself needs the room.
+    """
+    body, tags = split_hashtags(normalize_whitespace(content))
+    for kept in (tags, tags[:max_hashtags]):
+        suffix = hashtag_separator + " ".join(kept) if kept else ""
+        if len(body) + len(suffix) <= max_length:
+            return body + suffix, False
+    if len(body) <= max_length:
+        return body, False
+    return smart_truncate(body, max_length), True
+
+def optimize_locally(content: str, constraints: dict) -> Optional[str]:
+    """Returns the locally formatted content when the platform's policy allows skipping the LLM."""
+    policy = constraints.get("policy", POLICY_AUTO)
+    if policy == POLICY_LLM:
+        return None
+    formatted, truncated = format_for_platform(
+        content,
+        constraints["max_length"],
+        constraints.get("max_hashtags", 0),
+        constraints.get("hashtag_separator", " ")
+    )
+    if truncated and policy != POLICY_LOCAL:
+        return None
+    return formatted
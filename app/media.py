@@ -0,0 +1,345 @@
+# app/media.py
+
+import hashlib
+import mimetypes
+import mmap
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+import redis
+import requests
+from redis.exceptions import RedisError
+from .config import Config
+from .lazy import LazyClient
+from .http_client import http_clients
+from .quota import platform_account
+from .metrics import media_uploads, media_upload_bytes
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_IMAGES = 4
+
+class MediaFile(NamedTuple):
+    path: str
+    size: int
+    mime_type: str
+    alt_text: Optional[str] = None
+
+    @property
+    def kind(self) -> str:
+        """image, gif or video."""
+        if self.mime_type == 'image/gif':
+            return 'gif'
+        return self.mime_type.split('/')[0]
+
+class UploadedMedia(NamedTuple):
+    media_id: str
+    kind: str
+    alt_text: Optional[str] = None
+
+class MediaProcessing(Exception):
+    """Raised while a platform is still processing uploaded media."""
+
+    def __init__(self, platform: str, media_id: str, retry_after: float):
+        super().__init__(f"{platform} is still processing media {media_id}, check again in {retry_after:.0f}s")
+        self.platform = platform
+        self.media_id = media_id
+        self.retry_after = retry_after
+
+def resolve_media(items: Any) -> Tuple[List[MediaFile], Optional[str]]:
+    """Resolves the media of a post against MEDIA_ROOT; returns (files, error).
+
+    Items are ``{"path": ..., "alt_text": ...}`` with paths relative to
+    MEDIA_ROOT. A post carries up to four images or a single GIF or video.
+    """
+    if not items:
+        return [], None
+    if not isinstance(items, list) or not all(isinstance(item, dict) and item.get('path') for item in items):
+        return [], "media must be a list of objects with a path"
+    if len(items) > Config.MEDIA_MAX_ITEMS:
+        return [], f"A post can carry at most {Config.MEDIA_MAX_ITEMS} media items"
+
+    root = os.path.realpath(Config.MEDIA_ROOT)
+    files = []
+    for item in items:
+        path = os.path.realpath(os.path.join(root, item['path']))
+        if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            return [], f"Media not found: {item['path']}"
+        mime_type = mimetypes.guess_type(path)[0] or ''
+        if not mime_type.startswith(('image/', 'video/')):
+            return [], f"Unsupported media type: {item['path']}"
+        size = os.path.getsize(path)
+        if not 0 < size <= Config.MEDIA_MAX_BYTES:
+            return [], f"Media must be between 1 byte and {Config.MEDIA_MAX_BYTES} bytes: {item['path']}"
+        files.append(MediaFile(path, size, mime_type, item.get('alt_text')))
+
+    if len(files) > 1 and any(media.kind != 'image' for media in files):
+        return [], "A GIF or video must be the only media item of a post"
+    if len(files) > MAX_IMAGES:
+        return [], f"A post can carry at most {MAX_IMAGES} images"
+    return files, None
+
+def iter_chunks(path: str, chunk_size: int, offset: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """Yields (offset, chunk) from a memory-mapped file.
+
+    Only one chunk is copied out of the mapping at a time, so memory use does
+    not grow with the file size.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        while offset < len(mapped):
+            yield offset, mapped[offset:offset + chunk_size]
+            offset += chunk_size
+
+@lru_cache(maxsize=1024)
+def _digest(path: str, size: int, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    for _, chunk in iter_chunks(path, 1024 * 1024):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def media_digest(media: MediaFile) -> str:
+    """SHA-256 of a media file, remembered per path, size and modification time."""
+    return _digest(media.path, media.size, os.stat(media.path).st_mtime_ns)
+
+def _twitter_headers() -> Dict[str, str]:
+    return {"Authorization": f"Bearer {Config.TWITTER_ACCESS_TOKEN}"}
+
+def _twitter_processed(media_id: str, info: Dict[str, Any]) -> Optional[int]:
+    """Returns the expiry of processed media, raising MediaProcessing while Twitter is still working on it."""
+    processing = info.get("processing_info", {})
+    if processing.get("state") in ("pending", "in_progress"):
+        raise MediaProcessing("Twitter", media_id, processing.get("check_after_secs", 1))
+    if processing.get("state") == "failed":
+        raise ValueError(f"Twitter could not process media {media_id}: {processing.get('error')}")
+    return info.get("expires_after_secs")
+
+def check_twitter_media(media_id: str) -> Optional[int]:
+    """Asks Twitter whether parked media has finished processing; returns its expiry in seconds."""
+    response = http_clients.get("Twitter").get(Config.TWITTER_MEDIA_UPLOAD_URL, headers=_twitter_headers(),
+                                               params={"command": "STATUS", "media_id": media_id}, timeout=10)
+    response.raise_for_status()
+    return _twitter_processed(media_id, response.json())
+
+def upload_to_twitter(media: MediaFile) -> Tuple[str, Optional[int]]:
+    """Uploads with Twitter's INIT/APPEND/FINALIZE protocol; returns (media ID, expiry in seconds).
+
+    Videos and GIFs are processed asynchronously after FINALIZE; rather than
+    wait for that, MediaProcessing is raised so the post task can be parked.
+    """
+    session = http_clients.get("Twitter")
+    url = Config.TWITTER_MEDIA_UPLOAD_URL
+    response = session.post(url, headers=_twitter_headers(), data={
+        "command": "INIT",
+        "total_bytes": media.size,
+        "media_type": media.mime_type,
+        "media_category": f"tweet_{media.kind}"
+    }, timeout=10)
+    response.raise_for_status()
+    media_id = response.json()["media_id_string"]
+
+    for index, (_, chunk) in enumerate(iter_chunks(media.path, Config.MEDIA_CHUNK_SIZE)):
+        response = session.post(url, headers=_twitter_headers(), data={
+            "command": "APPEND",
+            "media_id": media_id,
+            "segment_index": index
+        }, files={"media": chunk}, timeout=60)
+        response.raise_for_status()
+
+    response = session.post(url, headers=_twitter_headers(), data={"command": "FINALIZE", "media_id": media_id},
+                            timeout=30)
+    response.raise_for_status()
+    info = response.json()
+
+    if media.alt_text:
+        session.post(Config.TWITTER_MEDIA_METADATA_URL, headers=_twitter_headers(), json={
+            "media_id": media_id, "alt_text": {"text": media.alt_text[:1000]}
+        }, timeout=10).raise_for_status()
+    return media_id, _twitter_processed(media_id, info)
+
+def upload_to_linkedin(media: MediaFile) -> Tuple[str, Optional[int]]:
+    """Registers an asset with LinkedIn and streams the file to its upload URL; returns (asset URN, None)."""
+    session = http_clients.get("LinkedIn")
+    headers = {
+        "Authorization": f"Bearer {Config.LINKEDIN_ACCESS_TOKEN}",
+        "X-Restli-Protocol-Version": "2.0.0"
+    }
+    recipe = "feedshare-video" if media.kind == 'video' else "feedshare-image"
+    response = session.post(f"{Config.LINKEDIN_ASSETS_URL}?action=registerUpload", headers=headers, json={
+        "registerUploadRequest": {
+            "recipes": [f"urn:li:digitalmediaRecipe:{recipe}"],
+            "owner": f"urn:li:person:{Config.LINKEDIN_PERSON_URN}",
+            "serviceRelationships": [{
+                "relationshipType": "OWNER",
+                "identifier": "urn:li:userGeneratedContent"
+            }]
+        }
+    }, timeout=10)
+    response.raise_for_status()
+    value = response.json()["value"]
+    upload_url = value["uploadMechanism"]["com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest"]["uploadUrl"]
+
+    # requests streams a file object in small blocks instead of reading it whole
+    with open(media.path, 'rb') as f:
+        response = session.put(upload_url, data=f, headers={
+            "Authorization": f"Bearer {Config.LINKEDIN_ACCESS_TOKEN}",
+            "Content-Type": media.mime_type
+        }, timeout=300)
+    response.raise_for_status()
+    return value["asset"], None
+
+def upload_to_threads(media: MediaFile) -> Tuple[str, Optional[int]]:
+    """Uploads with the resumable upload protocol, resuming from the server's offset after a failed chunk."""
+    session = http_clients.get("Threads")
+    headers = {"Authorization": f"OAuth {Config.THREADS_ACCESS_TOKEN}"}
+    response = session.post(f"{Config.THREADS_UPLOAD_URL}/{Config.THREADS_APP_ID}/uploads", headers=headers, params={
+        "file_name": os.path.basename(media.path),
+        "file_length": media.size,
+        "file_type": media.mime_type
+    }, timeout=10)
+    response.raise_for_status()
+    session_url = f"{Config.THREADS_UPLOAD_URL}/{response.json()['id']}"
+
+    offset, handle, resumes = 0, None, 0
+    while handle is None:
+        try:
+            for chunk_offset, chunk in iter_chunks(media.path, Config.MEDIA_CHUNK_SIZE, offset):
+                response = session.post(session_url, headers=dict(headers, file_offset=str(chunk_offset)),
+                                        data=chunk, timeout=60)
+                response.raise_for_status()
+                offset = chunk_offset + len(chunk)
+                handle = response.json().get("h")
+            if handle is None:
+                raise ValueError(f"Threads upload of {media.path} finished without a file handle")
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            resumes += 1
+            if resumes > 2:
+                raise
+            response = session.get(session_url, headers=headers, timeout=10)
+            response.raise_for_status()
+            offset = int(response.json().get("file_offset", offset))
+            logger.warning(f"Resuming Threads upload of {media.path} at byte {offset}")
+    return handle, None
+
+UPLOADERS = {
+    "Twitter": upload_to_twitter,
+    "LinkedIn": upload_to_linkedin,
+    "Threads": upload_to_threads,
+}
+
+# Platforms that process media after the upload, and how to check on it
+PROCESSING_CHECKS = {
+    "Twitter": check_twitter_media,
+}
+
+# Platforms that bind alt text to the upload rather than to the post
+UPLOAD_ALT_TEXT = {"Twitter"}
+
+class MediaUploader:
+    """Uploads a post's media to a platform, reusing earlier uploads.
+
+    Upload results are cached in Redis by platform account and file SHA-256,
+    plus the alt text where the platform binds it to the upload, so posting
+    the same asset again skips the upload. The items of a post are uploaded
+    concurrently on a shared pool; each platform's post task uploads its own
+    copy, so platforms proceed in parallel too. Media still being processed
+    is remembered with its upload time, so a parked post task checks on it
+    instead of uploading again, until ``processing_timeout`` runs out.
+    """
+
+    KEY_PREFIX = "media_upload"
+
+    def __init__(self, redis_url, ttl, max_workers, processing_timeout):
+        self.redis = LazyClient(lambda: redis.StrictRedis.from_url(redis_url))
+        self.ttl = ttl
+        self.processing_timeout = processing_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='media-upload')
+
+    def _key(self, platform: str, media: MediaFile) -> str:
+        key = f"{self.KEY_PREFIX}:{platform}:{platform_account(platform)}:{media_digest(media)}"
+        if platform in UPLOAD_ALT_TEXT and media.alt_text:
+            key += ":" + hashlib.sha256(media.alt_text.encode('utf-8')).hexdigest()[:16]
+        return key
+
+    def _cache(self, key: str, media_id: str, expires_in: Optional[int]) -> None:
+        ttl = min(self.ttl, expires_in - 600) if expires_in else self.ttl
+        try:
+            pipe = self.redis.pipeline()
+            pipe.delete(f"{key}:processing")
+            if ttl > 0:
+                pipe.set(key, media_id, ex=ttl)
+            pipe.execute()
+        except RedisError as e:
+            logger.error(f"Redis error in media upload cache: {str(e)}")
+
+    def _park(self, key: str, error: MediaProcessing, uploaded_at: float) -> None:
+        """Remembers media still being processed, or gives up once processing_timeout has passed."""
+        if time.time() - uploaded_at > self.processing_timeout:
+            raise TimeoutError(f"{error.platform} media {error.media_id} still processing after "
+                               f"{self.processing_timeout:.0f}s")
+        try:
+            self.redis.set(f"{key}:processing", f"{error.media_id} {uploaded_at}", ex=int(self.processing_timeout) + 60)
+        except RedisError as e:
+            logger.error(f"Redis error in media upload cache: {str(e)}")
+
+    def _upload(self, platform: str, media: MediaFile, key: str) -> str:
+        try:
+            media_id, expires_in = UPLOADERS[platform](media)
+        except MediaProcessing as e:
+            media_uploads.inc(platform=platform, result='uploaded')
+            media_upload_bytes.inc(media.size, platform=platform)
+            self._park(key, e, time.time())
+            raise
+        except Exception:
+            media_uploads.inc(platform=platform, result='error')
+            raise
+        media_uploads.inc(platform=platform, result='uploaded')
+        media_upload_bytes.inc(media.size, platform=platform)
+        self._cache(key, media_id, expires_in)
+        return media_id
+
+    def _check_processing(self, platform: str, key: str, parked: bytes) -> str:
+        media_id, uploaded_at = parked.decode('utf-8').split(" ")
+        try:
+            expires_in = PROCESSING_CHECKS[platform](media_id)
+        except MediaProcessing as e:
+            self._park(key, e, float(uploaded_at))
+            raise
+        self._cache(key, media_id, expires_in)
+        return media_id
+
+    def upload_all(self, platform: str, items: List[Dict[str, Any]]) -> List[UploadedMedia]:
+        """Returns the platform's uploads of a post's media, uploading what is not cached."""
+        files, error = resolve_media(items)
+        if error:
+            raise ValueError(error)
+        keys = [self._key(platform, media) for media in files]
+        try:
+            cached = self.redis.mget(keys + [f"{key}:processing" for key in keys])
+        except RedisError as e:
+            logger.error(f"Redis error in media upload cache: {str(e)}")
+            cached = [None] * len(keys) * 2
+
+        ids, pending = [], {}
+        for index, (media, key, media_id, parked) in enumerate(zip(files, keys, cached, cached[len(keys):])):
+            if media_id is not None:
+                media_uploads.inc(platform=platform, result='cached')
+                ids.append(media_id.decode('utf-8'))
+            elif parked is not None and platform in PROCESSING_CHECKS:
+                ids.append(None)
+                pending[index] = self.executor.submit(self._check_processing, platform, key, parked)
+            else:
+                ids.append(None)
+                pending[index] = self.executor.submit(self._upload, platform, media, key)
+        for index, future in pending.items():
+            ids[index] = future.result()
+        return [UploadedMedia(media_id, media.kind, media.alt_text) for media_id, media in zip(ids, files)]
+
+media_uploader = MediaUploader(
+    Config.REDIS_URL,
+    Config.MEDIA_UPLOAD_CACHE_TTL,
+    Config.MEDIA_UPLOAD_CONCURRENCY,
+    Config.MEDIA_PROCESSING_TIMEOUT
+)
@@ -0,0 +1,278 @@
+# app/metrics.py
+
+import atexit
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+import redis
+from redis.exceptions import RedisError
+from .config import Config
+from .lazy import LazyClient
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+def _label_string(labelnames: Tuple[str, ...], labels: Dict[str, str]) -> str:
+    parts = []
+    for name in labelnames:
+        value = str(labels.get(name, '')).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return ','.join(parts)
+
+def _format(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Counter:
+    """Monotonic counter; increments are buffered in-process until the next flush."""
+
+    type = 'counter'
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, value: float = 1, **labels) -> None:
+        if self.registry.enabled:
+            self.registry._add(self.name, _label_string(self.labelnames, labels), value)
+
+class Histogram:
+    """Histogram with fixed buckets; buffered like Counter."""
+
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        if not self.registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        bucket = _format(self.buckets[index]) if index < len(self.buckets) else '+Inf'
+        labelstr = _label_string(self.labelnames, labels)
+        self.registry._add(self.name, f"{labelstr}|{bucket}", 1, f"{labelstr}|sum", value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+class Gauge:
+    """Point-in-time value held by the process serving the scrape."""
+
+    type = 'gauge'
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def set(self, value: float, **labels) -> None:
+        self.values[_label_string(self.labelnames, labels)] = value
+
+class MetricsRegistry:
+    """Process-local metric buffers aggregated across processes in Redis.
+
+    Recording a sample only touches an in-process dict under a lock. A daemon
+    thread flushes the buffered deltas to one Redis hash per metric every
+    ``flush_interval`` seconds with HINCRBYFLOAT, so every web and worker
+    process adds into the same totals and any process can render them.
+    Gauges are not aggregated; collectors set them when a scrape is served.
+    """
+
+    KEY_PREFIX = "metrics"
+
+    def __init__(self, redis_url, flush_interval=5.0, enabled=True):
+        self.redis = LazyClient(lambda: redis.StrictRedis.from_url(redis_url))
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self._metrics = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._reset()
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, float]] = {}
+        self._flusher = None
+        self._pid = os.getpid()
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(self, name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._metrics.setdefault(name, Gauge(self, name, documentation, labelnames))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Registers a callable that updates gauges right before rendering."""
+        self._collectors.append(collector)
+
+    def _add(self, name: str, field: str, value: float, extra_field: str = None, extra_value: float = 0) -> None:
+        if os.getpid() != self._pid:
+            self._reset()
+        with self._lock:
+            fields = self._pending.setdefault(name, {})
+            fields[field] = fields.get(field, 0) + value
+            if extra_field:
+                fields[extra_field] = fields.get(extra_field, 0) + extra_value
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        pid = os.getpid()
+        while pid == self._pid:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        """Pushes this process's buffered deltas to Redis."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for name, fields in pending.items():
+                for field, value in fields.items():
+                    pipe.hincrbyfloat(f"{self.KEY_PREFIX}:{name}", field, value)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not flush metrics to Redis: {str(e)}")
+            with self._lock:
+                for name, fields in pending.items():
+                    current = self._pending.setdefault(name, {})
+                    for field, value in fields.items():
+                        current[field] = current.get(field, 0) + value
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        self.flush()
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {str(e)}")
+
+        aggregated = [m for m in self._metrics.values() if not isinstance(m, Gauge)]
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for metric in aggregated:
+                pipe.hgetall(f"{self.KEY_PREFIX}:{metric.name}")
+            stored = dict(zip((m.name for m in aggregated), pipe.execute()))
+        except RedisError as e:
+            logger.error(f"Could not read metrics from Redis: {str(e)}")
+            stored = {}
+
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            if isinstance(metric, Gauge):
+                values = metric.values
+            else:
+                values = {k.decode('utf-8'): float(v) for k, v in stored.get(metric.name, {}).items()}
+            if isinstance(metric, Histogram):
+                lines.extend(self._render_histogram(metric, values))
+            else:
+                for labelstr, value in sorted(values.items()):
+                    lines.append(f"{metric.name}{{{labelstr}}} {_format(value)}" if labelstr
+                                 else f"{metric.name} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histogram(metric: Histogram, values: Dict[str, float]) -> List[str]:
+        series = {}
+        for field, value in values.items():
+            labelstr, _, suffix = field.rpartition('|')
+            series.setdefault(labelstr, {})[suffix] = value
+
+        lines = []
+        for labelstr, fields in sorted(series.items()):
+            prefix = f"{labelstr}," if labelstr else ""
+            cumulative = 0
+            for bound in [_format(b) for b in metric.buckets] + ['+Inf']:
+                cumulative += fields.get(bound, 0)
+                lines.append(f'{metric.name}_bucket{{{prefix}le="{bound}"}} {_format(cumulative)}')
+            braces = f"{{{labelstr}}}" if labelstr else ""
+            lines.append(f"{metric.name}_sum{braces} {_format(fields.get('sum', 0))}")
+            lines.append(f"{metric.name}_count{braces} {_format(cumulative)}")
+        return lines
+
+# Process-wide registry; each module declares the metrics it records below
+metrics = MetricsRegistry(Config.REDIS_URL, Config.METRICS_FLUSH_INTERVAL, Config.METRICS_ENABLED)
+
+optimize_cache_lookups = metrics.counter(
+    'crosspost_optimize_cache_lookups_total', 'Optimization cache lookups by tier that answered', ('result',))
+near_duplicate_lookups = metrics.counter(
+    'crosspost_near_duplicate_lookups_total', 'Near-duplicate index lookups by result', ('result',))
+near_duplicate_lookup_seconds = metrics.histogram(
+    'crosspost_near_duplicate_lookup_seconds', 'Latency of near-duplicate index lookups', (), FAST_BUCKETS)
+optimize_paths = metrics.counter(
+    'crosspost_optimize_total', 'Optimizations by platform and whether the LLM was skipped (path=local) '
+    'or consulted (path=llm)', ('platform', 'path'))
+llm_request_seconds = metrics.histogram(
+    'crosspost_llm_request_seconds', 'Latency of Anthropic completion requests; for streams, until the '
+    'result was cut off', ('mode',))
+llm_stream_stops = metrics.counter(
+    'crosspost_llm_stream_stops_total', 'Streamed optimizations by platform and why reading stopped '
+    '(budget, boundary or complete)', ('platform', 'reason'))
+llm_tokens = metrics.counter(
+    'crosspost_llm_tokens_total', 'Tokens sent to and generated by Anthropic (estimated at 4 characters '
+    'per token when the response has no usage)', ('mode', 'kind'))
+platform_request_seconds = metrics.histogram(
+    'crosspost_platform_request_seconds', 'Latency of post_to_platform calls', ('platform', 'outcome'))
+platform_responses = metrics.counter(
+    'crosspost_platform_responses_total', 'Upstream HTTP responses by platform and status code',
+    ('platform', 'status'))
+platform_retries = metrics.counter(
+    'crosspost_platform_retries_total', 'Post task retries by platform and reason', ('platform', 'reason'))
+rate_limit_check_seconds = metrics.histogram(
+    'crosspost_rate_limit_check_seconds', 'Latency of rate limit checks', ('limiter',), FAST_BUCKETS)
+rate_limit_rejections = metrics.counter(
+    'crosspost_rate_limit_rejections_total', 'Rate limit checks that denied the request', ('limiter',))
+media_uploads = metrics.counter(
+    'crosspost_media_uploads_total', 'Media attachments by platform and whether they were uploaded, '
+    'served from the upload cache or failed', ('platform', 'result'))
+media_upload_bytes = metrics.counter(
+    'crosspost_media_upload_bytes_total', 'Bytes of media uploaded by platform', ('platform',))
+task_runtime_seconds = metrics.histogram(
+    'crosspost_celery_task_seconds', 'Celery task runtime by task and final state', ('task', 'state'))
+queue_depth = metrics.gauge(
+    'crosspost_celery_queue_depth', 'Messages waiting in each Celery queue', ('queue',))
+scheduled_posts = metrics.gauge(
+    'crosspost_scheduled_posts', 'Scheduled posts by state', ('state',))
+
+def estimate_tokens(text: str) -> int:
+    return max(len(text or '') // 4, 1)
+
+def record_llm_usage(mode: str, seconds: float, prompt: str, completion: str, usage=None) -> None:
+    """Records latency and token usage of one Anthropic completion."""
+    llm_request_seconds.observe(seconds, mode=mode)
+    prompt_tokens = getattr(usage, 'input_tokens', None) or estimate_tokens(prompt)
+    completion_tokens = getattr(usage, 'output_tokens', None) or estimate_tokens(completion)
+    llm_tokens.inc(prompt_tokens, mode=mode, kind='prompt')
+    llm_tokens.inc(completion_tokens, mode=mode, kind='completion')
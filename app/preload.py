@@ -0,0 +1,25 @@
+# app/preload.py
+
+import gc
+import time
+from .validation import content_validator
+import logging
+
+logger = logging.getLogger(__name__)
+
+def warm_up() -> None:
+    """Loads heavy modules and read-only state once, before workers fork.
+
+    Children inherit everything loaded here copy-on-write. Clients and
+    connections are not created; each process builds its own on first use.
+    """
+    start = time.perf_counter()
+    import anthropic  # noqa: F401
+
+    content_validator.load_language_profiles()
+
+    # Keep the preloaded objects out of the collector so its passes in the
+    # children don't touch, and therefore copy, the shared pages
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Preloaded shared state in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,163 @@
+# app/quota.py
+
+import hashlib
+import json
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import redis
+from redis.exceptions import RedisError
+from .config import Config
+from .lazy import LazyClient
+import logging
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = quota hash. Returns 0 and spends one request when the platform
+# has capacity (or its quota is unknown), otherwise the wait in ms.
+ACQUIRE_SCRIPT = """
+local key = KEYS[1]
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local state = redis.call('HMGET', key, 'remaining', 'reset_at', 'blocked_until')
+
+local blocked_until = tonumber(state[3]) or 0
+if blocked_until > now then
+    return blocked_until - now
+end
+
+local reset_at = tonumber(state[2]) or 0
+if not state[1] or reset_at <= now then
+    return 0
+end
+
+if tonumber(state[1]) > 0 then
+    redis.call('HINCRBY', key, 'remaining', -1)
+    return 0
+end
+return reset_at - now
+"""
+
+class PlatformRateLimited(Exception):
+    """Raised when a platform throttles a request."""
+
+    def __init__(self, platform: str, retry_after: float):
+        super().__init__(f"{platform} rate limit reached, retry after {retry_after:.0f}s")
+        self.platform = platform
+        self.retry_after = retry_after
+
+def platform_account(platform: str) -> str:
+    """Returns a stable, non-secret identifier for the account used on a platform."""
+    tokens = {
+        "Twitter": Config.TWITTER_ACCESS_TOKEN,
+        "LinkedIn": Config.LINKEDIN_ACCESS_TOKEN,
+        "Threads": Config.THREADS_ACCESS_TOKEN,
+    }
+    token = tokens.get(platform) or "default"
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class PlatformQuotaScheduler:
+    """Tracks each platform account's upstream quota in Redis.
+
+    Quota state is learned from response headers: x-rate-limit-* (Twitter),
+    X-App-Usage / X-Business-Use-Case-Usage (Threads) and Retry-After on
+    throttled responses from any platform.
+    """
+
+    def __init__(self, redis_url):
+        self.redis = LazyClient(lambda: redis.StrictRedis.from_url(redis_url))
+        self._acquire = LazyClient(lambda: self.redis.register_script(ACQUIRE_SCRIPT))
+
+    @staticmethod
+    def _key(platform: str, account: str) -> str:
+        return f"platform_quota:{platform}:{account}"
+
+    def acquire(self, platform: str, account: str) -> float:
+        """Spends one request of quota; returns seconds to wait if there is none."""
+        try:
+            wait_ms = self._acquire(keys=[self._key(platform, account)])
+            return int(wait_ms) / 1000
+        except RedisError as e:
+            logger.error(f"Redis error in quota scheduler: {str(e)}")
+            return 0.0
+
+    def record(self, platform: str, account: str, response) -> Optional[float]:
+        """Updates quota state from a platform response.
+
+        Returns the number of seconds to back off if the response was throttled.
+        """
+        headers = response.headers
+        now = time.time()
+        state = {}
+
+        remaining = headers.get('x-rate-limit-remaining') or headers.get('x-ratelimit-remaining')
+        reset = headers.get('x-rate-limit-reset') or headers.get('x-ratelimit-reset')
+        if remaining is not None and reset is not None:
+            try:
+                state['remaining'] = int(remaining)
+                state['reset_at'] = int(float(reset) * 1000)
+            except ValueError:
+                pass
+
+        backoff = None
+        usage = headers.get('x-business-use-case-usage') or headers.get('x-app-usage')
+        if usage:
+            backoff = self._meta_backoff(usage)
+
+        if response.status_code in (429, 503):
+            backoff = max(backoff or 0.0, parse_retry_after(headers.get('retry-after')) or 0.0)
+        # A 503 without Retry-After is an outage for the circuit breaker, not a quota limit
+        if response.status_code == 429:
+            if not backoff and 'reset_at' in state:
+                backoff = max(state['reset_at'] / 1000 - now, 0.0)
+            backoff = backoff or 60.0
+
+        if backoff:
+            state['blocked_until'] = int((now + backoff) * 1000)
+
+        if state:
+            try:
+                ttl = max(int(max(state.get('reset_at', 0), state.get('blocked_until', 0)) / 1000 - now), 3600)
+                pipe = self.redis.pipeline()
+                pipe.hset(self._key(platform, account), mapping=state)
+                pipe.expire(self._key(platform, account), ttl)
+                pipe.execute()
+            except RedisError as e:
+                logger.error(f"Redis error in quota scheduler: {str(e)}")
+
+        return backoff
+
+    @staticmethod
+    def _meta_backoff(usage: str) -> Optional[float]:
+        """Reads the back-off period from Meta's usage headers."""
+        try:
+            data = json.loads(usage)
+        except ValueError:
+            return None
+        entries = [data] if 'call_count' in data else [
+            entry for value in data.values() for entry in (value if isinstance(value, list) else [value])
+        ]
+        backoff = None
+        for entry in entries:
+            minutes = entry.get('estimated_time_to_regain_access') or 0
+            if minutes:
+                backoff = max(backoff or 0.0, minutes * 60.0)
+            elif max(entry.get('call_count', 0), entry.get('total_time', 0), entry.get('total_cputime', 0)) >= 100:
+                backoff = max(backoff or 0.0, 60.0)
+        return backoff
+
+# Shared by every process that posts to a platform
+quota_scheduler = PlatformQuotaScheduler(Config.REDIS_URL)
@@ -1,30 +1,338 @@
 # app/rate_limiter.py
 
+import math
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Dict, Tuple
 import redis
 from redis.exceptions import RedisError
 from .config import Config
+from .lazy import LazyClient
+from .metrics import rate_limit_check_seconds, rate_limit_rejections
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Every script takes KEYS[1] = bucket key and ARGV = limit, window (ms), cost,
+# lease and returns {allowed, remaining, reset_after_ms, retry_after_ms,
+# leased}. ``lease`` extra tokens are taken along with the cost when both fit,
+# otherwise only the cost is. Time is read from the Redis server so all web
+# hosts share one clock.
+
+SLIDING_LOG_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local lease = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+local allowed = 0
+local retry_after = 0
+local leased = 0
+
+if lease > 0 and count + cost + lease <= limit then
+    cost = cost + lease
+    leased = lease
+end
+
+if count + cost <= limit then
+    for i = 1, cost do
+        redis.call('ZADD', key, now, ARGV[5] .. ':' .. i)
+    end
+    redis.call('PEXPIRE', key, window)
+    count = count + cost
+    allowed = 1
+else
+    local blocking = redis.call('ZRANGE', key, count + cost - limit - 1, count + cost - limit - 1, 'WITHSCORES')
+    if blocking[2] then
+        retry_after = tonumber(blocking[2]) + window - now
+    else
+        retry_after = window
+    end
+end
+
+local reset_after = 0
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset_after = tonumber(oldest[2]) + window - now
+end
+
+return {allowed, math.max(limit - count, 0), reset_after, retry_after, leased}
+"""
+
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local lease = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+
+local current = math.floor(now / window)
+local elapsed = now - current * window
+local counts = redis.call('HMGET', key, current, current - 1)
+local cur = tonumber(counts[1]) or 0
+local prev = tonumber(counts[2]) or 0
+local weighted = prev * (window - elapsed) / window + cur
+local allowed = 0
+local retry_after = 0
+local leased = 0
+
+if lease > 0 and weighted + cost + lease <= limit then
+    cost = cost + lease
+    leased = lease
+end
+
+if weighted + cost <= limit then
+    redis.call('HINCRBY', key, current, cost)
+    redis.call('HDEL', key, current - 2)
+    redis.call('PEXPIRE', key, window * 2)
+    weighted = weighted + cost
+    allowed = 1
+elseif prev > 0 and cur + cost <= limit then
+    retry_after = math.ceil(window * (1 - (limit - cur - cost) / prev)) - elapsed
+else
+    retry_after = window - elapsed
+end
+
+return {allowed, math.max(math.floor(limit - weighted), 0), window - elapsed, math.max(retry_after, 0), leased}
+"""
+
+GCRA_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local lease = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+
+local interval = window / limit
+local epsilon = 0.001
+local tat = tonumber(redis.call('GET', key)) or now
+tat = math.max(tat, now)
+local leased = 0
+if lease > 0 and tat + (cost + lease) * interval - now <= window + epsilon then
+    leased = lease
+end
+local new_tat = tat + (cost + leased) * interval
+
+if new_tat - now > window + epsilon then
+    local remaining = math.floor((window - (tat - now)) / interval + epsilon)
+    return {0, math.max(remaining, 0), math.ceil(tat - now), math.ceil(new_tat - now - window), 0}
+end
+
+redis.call('SET', key, string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+local remaining = math.floor((window - (new_tat - now)) / interval + epsilon)
+return {1, math.max(remaining, 0), math.ceil(new_tat - now), 0, leased}
+"""
+
+SCRIPTS = {
+    "sliding_log": SLIDING_LOG_SCRIPT,
+    "sliding_window": SLIDING_WINDOW_SCRIPT,
+    "gcra": GCRA_SCRIPT,
+}
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float
+
 class RedisRateLimiter:
-    def __init__(self, redis_url, requests, window):
-        self.redis = redis.StrictRedis.from_url(redis_url)
+    def __init__(self, redis_url, requests, window, algorithm='sliding_window'):
+        if algorithm not in SCRIPTS:
+            raise ValueError(f"Unsupported rate limit algorithm: {algorithm}")
+        self.redis = LazyClient(lambda: redis.StrictRedis.from_url(redis_url))
         self.requests = requests
         self.window = window
+        self.algorithm = algorithm
+        self._script = LazyClient(lambda: self.redis.register_script(SCRIPTS[algorithm]))
 
-    def is_allowed(self, client_id: str) -> bool:
+    def check(self, client_id: str, cost: int = 1) -> RateLimitResult:
+        """Consumes ``cost`` requests from the client's quota in one round trip."""
+        return self.reserve(client_id, cost)[0]
+
+    def reserve(self, client_id: str, cost: int = 1, lease: int = 0) -> Tuple[RateLimitResult, int]:
+        """Consumes ``cost`` requests plus ``lease`` extra tokens when both fit, else just ``cost``.
+
+        Returns the result and the number of extra tokens taken, in one round trip.
+        """
+        start = time.perf_counter()
+        result, leased = self._reserve(client_id, cost, lease)
+        rate_limit_check_seconds.observe(time.perf_counter() - start, limiter='redis')
+        if not result.allowed:
+            rate_limit_rejections.inc(limiter='redis')
+        return result, leased
+
+    def _reserve(self, client_id: str, cost: int, lease: int) -> Tuple[RateLimitResult, int]:
         try:
-            key = f"rate_limit:{client_id}"
-            current = self.redis.get(key)
-            if current and int(current) >= self.requests:
-                return False
-            else:
-                pipe = self.redis.pipeline()
-                pipe.incr(key, 1)
-                pipe.expire(key, self.window)
-                pipe.execute()
-                return True
+            key = f"rate_limit:{client_id}:{self.algorithm}"
+            args = [self.requests, self.window * 1000, cost, lease]
+            if self.algorithm == "sliding_log":
+                args.append(uuid.uuid4().hex)
+            allowed, remaining, reset_after, retry_after, leased = self._script(keys=[key], args=args)
+            return RateLimitResult(
+                allowed=bool(allowed),
+                limit=self.requests,
+                remaining=int(remaining),
+                reset_after=int(reset_after) / 1000,
+                retry_after=int(retry_after) / 1000
+            ), int(leased)
         except RedisError as e:
             logger.error(f"Redis error in rate limiter: {str(e)}")
-            return False
\ No newline at end of file
+            return RateLimitResult(False, self.requests, 0, self.window, self.window), 0
+
+    def is_allowed(self, client_id: str) -> bool:
+        return self.check(client_id).allowed
+
+class _Lease:
+    __slots__ = ("tokens", "expires_at", "remaining", "reset_at", "denied_until", "refilling")
+
+    def __init__(self):
+        self.tokens = 0
+        self.expires_at = 0.0
+        self.remaining = 0
+        self.reset_at = 0.0
+        self.denied_until = 0.0
+        self.refilling = False
+
+class LeasedRateLimiter:
+    """Two-tier limiter that decides locally from quota leases.
+
+    Each process reserves ``lease_size`` tokens at a time from the wrapped
+    RedisRateLimiter and spends them without touching Redis, refilling the
+    lease in the background once it runs low. Leased tokens are already
+    counted in Redis, so the global limit is never exceeded; at most
+    ``lease_size`` tokens per process and client go unused when a lease
+    expires after ``lease_ttl`` seconds.
+    """
+
+    def __init__(self, limiter: RedisRateLimiter, lease_size, lease_ttl, max_clients=10000):
+        self.limiter = limiter
+        self.requests = limiter.requests
+        self.lease_size = max(1, min(lease_size, limiter.requests))
+        self.refill_threshold = self.lease_size // 4
+        self.lease_ttl = lease_ttl
+        self.max_clients = max_clients
+        self._reset()
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._leases = OrderedDict()
+        self._refiller = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rate-limit-refill')
+        self._pid = os.getpid()
+
+    def check(self, client_id: str, cost: int = 1) -> RateLimitResult:
+        start = time.perf_counter()
+        result = self._check(client_id, cost)
+        rate_limit_check_seconds.observe(time.perf_counter() - start, limiter='leased')
+        if not result.allowed:
+            rate_limit_rejections.inc(limiter='leased')
+        return result
+
+    def _check(self, client_id: str, cost: int) -> RateLimitResult:
+        if os.getpid() != self._pid:
+            self._reset()
+        now = time.monotonic()
+
+        with self._lock:
+            lease = self._leases.get(client_id)
+            if lease is None:
+                lease = self._leases[client_id] = _Lease()
+                while len(self._leases) > self.max_clients:
+                    self._leases.popitem(last=False)
+            self._leases.move_to_end(client_id)
+
+            if lease.expires_at <= now:
+                lease.tokens = 0
+            if lease.tokens >= cost:
+                lease.tokens -= cost
+                if lease.tokens <= self.refill_threshold and not lease.refilling:
+                    lease.refilling = True
+                    self._refiller.submit(self._refill, client_id, lease)
+                return self._local_result(lease, now, True)
+            if lease.denied_until > now:
+                return self._local_result(lease, now, False)
+
+        # Lease exhausted: reserve synchronously; the script falls back to
+        # the exact cost when a new lease does not fit
+        result, granted = self.limiter.reserve(client_id, cost, self.lease_size)
+
+        with self._lock:
+            self._apply(lease, result, granted, now)
+            return self._local_result(lease, now, result.allowed)
+
+    def _refill(self, client_id: str, lease: _Lease) -> None:
+        # Reserves the lease alone; when it does not fit the client is not
+        # denied, the remaining tokens are spent and then checked exactly
+        try:
+            result, granted = self.limiter.reserve(client_id, 0, self.lease_size)
+            with self._lock:
+                now = time.monotonic()
+                if granted:
+                    self._apply(lease, result, granted, now)
+                else:
+                    lease.remaining = result.remaining
+                    lease.reset_at = now + result.reset_after
+        finally:
+            lease.refilling = False
+
+    def _apply(self, lease: _Lease, result: RateLimitResult, granted: int, now: float) -> None:
+        if result.allowed:
+            if lease.expires_at <= now:
+                lease.tokens = 0
+            lease.tokens += granted
+            lease.expires_at = now + self.lease_ttl
+            lease.denied_until = 0.0
+        else:
+            lease.denied_until = now + result.retry_after
+        lease.remaining = result.remaining
+        lease.reset_at = now + result.reset_after
+
+    def _local_result(self, lease: _Lease, now: float, allowed: bool) -> RateLimitResult:
+        return RateLimitResult(
+            allowed=allowed,
+            limit=self.requests,
+            remaining=lease.remaining + lease.tokens,
+            reset_after=max(lease.reset_at - now, 0),
+            retry_after=0 if allowed else max(lease.denied_until - now, 0)
+        )
+
+    def is_allowed(self, client_id: str) -> bool:
+        return self.check(client_id).allowed
+
+def create_rate_limiter():
+    """Builds the process-wide rate limiter from Config."""
+    limiter = RedisRateLimiter(Config.REDIS_URL, Config.RATE_LIMIT_REQUESTS, Config.RATE_LIMIT_WINDOW,
+                               Config.RATE_LIMIT_ALGORITHM)
+    if Config.RATE_LIMIT_LEASE_SIZE > 1:
+        return LeasedRateLimiter(limiter, Config.RATE_LIMIT_LEASE_SIZE, Config.RATE_LIMIT_LEASE_TTL)
+    return limiter
+
+# Shared by every API namespace in this process
+rate_limiter = create_rate_limiter()
+
+def rate_limit_headers(result: RateLimitResult) -> Dict[str, str]:
+    """Builds X-RateLimit-* and Retry-After response headers."""
+    headers = {
+        "X-RateLimit-Limit": str(result.limit),
+        "X-RateLimit-Remaining": str(result.remaining),
+        "X-RateLimit-Reset": str(math.ceil(result.reset_after))
+    }
+    if not result.allowed:
+        headers["Retry-After"] = str(max(math.ceil(result.retry_after), 1))
+    return headers
@@ -0,0 +1,231 @@
+# app/resilience.py
+
+import random
+import time
+from typing import Dict, Iterable, NamedTuple
+import redis
+import requests
+from redis.exceptions import RedisError
+from .config import Config
+from .lazy import LazyClient
+import logging
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = breaker hash, ARGV = probe timeout (ms). Returns 0 when a call may
+# go ahead, otherwise the wait in ms. Once the cooldown has passed a single
+# caller is let through as the half-open probe.
+ALLOW_SCRIPT = """
+local key = KEYS[1]
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local state = redis.call('HMGET', key, 'state', 'open_until', 'probe_until')
+
+if state[1] ~= 'open' then
+    return 0
+end
+local open_until = tonumber(state[2]) or 0
+if now < open_until then
+    return open_until - now
+end
+local probe_until = tonumber(state[3]) or 0
+if probe_until > now then
+    return probe_until - now
+end
+redis.call('HSET', key, 'probe_until', now + tonumber(ARGV[1]))
+return 0
+"""
+
+# KEYS[1] = breaker hash, ARGV = success (0/1), failure threshold, failure
+# window (ms), cooldown (ms). Returns 1 if the breaker is open afterwards.
+RECORD_SCRIPT = """
+local key = KEYS[1]
+if tonumber(ARGV[1]) == 1 then
+    redis.call('DEL', key)
+    return 0
+end
+
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local cooldown = tonumber(ARGV[4])
+
+if redis.call('HGET', key, 'state') == 'open' then
+    redis.call('HSET', key, 'open_until', now + cooldown, 'probe_until', 0)
+    redis.call('PEXPIRE', key, cooldown * 10)
+    return 1
+end
+
+local failures = redis.call('HINCRBY', key, 'failures', 1)
+if failures == 1 then
+    redis.call('PEXPIRE', key, tonumber(ARGV[3]))
+end
+if failures >= tonumber(ARGV[2]) then
+    redis.call('HSET', key, 'state', 'open', 'open_until', now + cooldown, 'probe_until', 0)
+    redis.call('PEXPIRE', key, cooldown * 10)
+    return 1
+end
+return 0
+"""
+
+# KEYS[1] = current bucket, KEYS[2] = previous bucket, ARGV = ratio, minimum
+# retries, bucket TTL (s). Spends one retry if the budget allows it.
+SPEND_RETRY_SCRIPT = """
+local requests = 0
+local retries = 0
+for _, key in ipairs(KEYS) do
+    local counts = redis.call('HMGET', key, 'requests', 'retries')
+    requests = requests + (tonumber(counts[1]) or 0)
+    retries = retries + (tonumber(counts[2]) or 0)
+end
+if retries < tonumber(ARGV[2]) + requests * tonumber(ARGV[1]) then
+    redis.call('HINCRBY', KEYS[1], 'retries', 1)
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+    return 1
+end
+return 0
+"""
+
+class RetryPolicy(NamedTuple):
+    max_retries: int
+    base_delay: float
+    max_delay: float
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with random jitter for the given retry attempt."""
+        return random.uniform(self.base_delay, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+def _policy(base_delay_factor=1.0) -> RetryPolicy:
+    return RetryPolicy(Config.POST_MAX_RETRIES, Config.POST_RETRY_BASE_DELAY * base_delay_factor,
+                       Config.POST_RETRY_MAX_DELAY)
+
+# The only retry policy applied to platform posts; transports do not retry POSTs
+RETRY_POLICIES = {
+    "Twitter": _policy(),
+    "Threads": _policy(),
+    "LinkedIn": _policy(base_delay_factor=2.0),
+}
+
+def is_transient(error: Exception) -> bool:
+    """True for failures worth retrying and counting against a platform's health."""
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+class CircuitBreaker:
+    """Per-platform circuit breaker whose state is shared through Redis.
+
+    ``failure_threshold`` transient failures within ``failure_window`` seconds
+    open the breaker for ``cooldown`` seconds, during which every worker
+    fails fast. Afterwards one probe call is let through. A success closes
+    the breaker, and a failed probe reopens it.
+    """
+
+    def __init__(self, redis_url, failure_threshold, failure_window, cooldown, probe_timeout):
+        self.redis = LazyClient(lambda: redis.StrictRedis.from_url(redis_url))
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout
+        self._allow = LazyClient(lambda: self.redis.register_script(ALLOW_SCRIPT))
+        self._record = LazyClient(lambda: self.redis.register_script(RECORD_SCRIPT))
+
+    @staticmethod
+    def _key(platform: str) -> str:
+        return f"circuit:{platform}"
+
+    def allow(self, platform: str) -> float:
+        """Returns 0 if a call to the platform may proceed, otherwise seconds to wait."""
+        try:
+            wait_ms = self._allow(keys=[self._key(platform)], args=[int(self.probe_timeout * 1000)])
+            return int(wait_ms) / 1000
+        except RedisError as e:
+            logger.error(f"Redis error in circuit breaker: {str(e)}")
+            return 0.0
+
+    def record(self, platform: str, success: bool) -> None:
+        try:
+            opened = self._record(keys=[self._key(platform)], args=[
+                int(success), self.failure_threshold, int(self.failure_window * 1000), int(self.cooldown * 1000)
+            ])
+            if opened:
+                logger.warning(f"Circuit for {platform} is open for {self.cooldown}s")
+        except RedisError as e:
+            logger.error(f"Redis error in circuit breaker: {str(e)}")
+
+    def states(self, platforms: Iterable[str]) -> Dict[str, Dict]:
+        """Reports the breaker state of each platform."""
+        platforms = list(platforms)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for platform in platforms:
+                pipe.hgetall(self._key(platform))
+            stored = pipe.execute()
+        except RedisError as e:
+            logger.error(f"Redis error in circuit breaker: {str(e)}")
+            return {platform: {"state": "unknown"} for platform in platforms}
+
+        now = time.time() * 1000
+        states = {}
+        for platform, data in zip(platforms, stored):
+            data = {k.decode('utf-8'): v.decode('utf-8') for k, v in data.items()}
+            if data.get('state') != 'open':
+                states[platform] = {"state": "closed", "failures": int(data.get('failures', 0))}
+            elif float(data.get('open_until', 0)) > now:
+                states[platform] = {"state": "open",
+                                    "retry_after": round((float(data['open_until']) - now) / 1000, 1)}
+            else:
+                states[platform] = {"state": "half_open"}
+        return states
+
+class RetryBudget:
+    """Caps post retries per platform at a fraction of recent requests.
+
+    Requests and retries are counted in Redis per ``window`` seconds across
+    all workers. A retry is allowed while the retries over the current and
+    previous windows stay below ``min_retries + ratio * requests``, so an
+    outage cannot multiply the load on a platform.
+    """
+
+    def __init__(self, redis_url, ratio, min_retries, window):
+        self.redis = LazyClient(lambda: redis.StrictRedis.from_url(redis_url))
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._spend = LazyClient(lambda: self.redis.register_script(SPEND_RETRY_SCRIPT))
+
+    def _keys(self, platform: str):
+        bucket = int(time.time() // self.window)
+        return [f"retry_budget:{platform}:{bucket}", f"retry_budget:{platform}:{bucket - 1}"]
+
+    def record_request(self, platform: str) -> None:
+        key = self._keys(platform)[0]
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hincrby(key, 'requests', 1)
+            pipe.expire(key, self.window * 2)
+            pipe.execute()
+        except RedisError as e:
+            logger.error(f"Redis error in retry budget: {str(e)}")
+
+    def try_spend(self, platform: str) -> bool:
+        """Spends one retry from the platform's budget if any is left."""
+        try:
+            return bool(self._spend(keys=self._keys(platform), args=[self.ratio, self.min_retries, self.window * 2]))
+        except RedisError as e:
+            logger.error(f"Redis error in retry budget: {str(e)}")
+            return True
+
+circuit_breaker = CircuitBreaker(
+    Config.REDIS_URL,
+    Config.CIRCUIT_FAILURE_THRESHOLD,
+    Config.CIRCUIT_FAILURE_WINDOW,
+    Config.CIRCUIT_COOLDOWN,
+    Config.CIRCUIT_PROBE_TIMEOUT
+)
+
+retry_budget = RetryBudget(
+    Config.REDIS_URL,
+    Config.RETRY_BUDGET_RATIO,
+    Config.RETRY_BUDGET_MIN,
+    Config.RETRY_BUDGET_WINDOW
+)
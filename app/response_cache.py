@@ -0,0 +1,89 @@
+# app/response_cache.py
+
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+from flask import current_app, has_app_context
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ThreadResponseCache:
+    """Read-through cache for Threads API reads on top of Flask-Caching.
+
+    Entries are fresh for the resource's TTL and are then served stale for up
+    to ``stale_ttl`` more seconds while a background request revalidates them
+    with the upstream ETag. Every entry carries its own ETag for clients.
+    """
+
+    def __init__(self, cache, fetch: Callable[[str, str, Optional[str]], Tuple[int, Any, Optional[str]]],
+                 ttls: Dict[str, int], stale_ttl: int):
+        self.cache = cache
+        self.fetch = fetch
+        self.ttls = ttls
+        self.stale_ttl = stale_ttl
+        self.app = None
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='threads-revalidate')
+
+    def init_app(self, app) -> None:
+        """Binds the app whose cache is used by writes made outside a request."""
+        self.app = app
+
+    @staticmethod
+    def _key(thread_id: str, resource: str) -> str:
+        return f"threads:{resource}:{thread_id}"
+
+    @staticmethod
+    def make_etag(body: Any) -> str:
+        payload = json.dumps(body, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def get(self, thread_id: str, resource: str) -> Dict[str, Any]:
+        """Returns the cached entry for a thread resource, fetching it on a miss."""
+        key = self._key(thread_id, resource)
+        entry = self.cache.get(key)
+        if entry is None:
+            return self._refresh(thread_id, resource, None)
+
+        age = time.time() - entry["fetched_at"]
+        if age > self.ttls[resource] and self.cache.add(f"{key}:revalidating", True, timeout=30):
+            app = current_app._get_current_object()
+            self._executor.submit(self._revalidate, app, thread_id, resource, entry)
+        return entry
+
+    def _revalidate(self, app, thread_id: str, resource: str, entry: Dict[str, Any]) -> None:
+        with app.app_context():
+            key = self._key(thread_id, resource)
+            try:
+                self._refresh(thread_id, resource, entry)
+            except Exception as e:
+                logger.error(f"Error revalidating {resource} for thread {thread_id}: {str(e)}")
+            finally:
+                self.cache.delete(f"{key}:revalidating")
+
+    def _refresh(self, thread_id: str, resource: str, entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        status, body, upstream_etag = self.fetch(thread_id, resource, entry["upstream_etag"] if entry else None)
+        if status == 304 and entry:
+            entry = dict(entry, fetched_at=time.time())
+        else:
+            entry = {
+                "body": body,
+                "etag": self.make_etag(body),
+                "upstream_etag": upstream_etag,
+                "fetched_at": time.time()
+            }
+        self.cache.set(self._key(thread_id, resource), entry, timeout=self.ttls[resource] + self.stale_ttl)
+        return entry
+
+    def invalidate(self, thread_id: str) -> None:
+        """Drops every cached resource of a thread, inside the bound app's context if needed."""
+        keys = [self._key(thread_id, resource) for resource in self.ttls]
+        if has_app_context():
+            self.cache.delete_many(*keys)
+        elif self.app is not None:
+            with self.app.app_context():
+                self.cache.delete_many(*keys)
+        else:
+            logger.warning(f"No app bound to the response cache, thread {thread_id} may be served stale")
@@ -0,0 +1,144 @@
+# app/scheduler.py
+
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+import redis
+from redis.exceptions import RedisError
+from .config import Config
+from .lazy import LazyClient
+import logging
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = scheduled zset, KEYS[2] = dispatching zset, ARGV = now, batch
+# size, lease. Moves up to a batch of due IDs to the dispatching set and
+# returns them; IDs whose dispatch lease expired are due again first.
+POP_DUE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local batch = tonumber(ARGV[2])
+
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[3]), 'LIMIT', 0, batch)
+for _, id in ipairs(stale) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('ZADD', KEYS[1], now, id)
+end
+
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, batch)
+for _, id in ipairs(due) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZADD', KEYS[2], now, id)
+end
+return due
+"""
+
+class PostScheduler:
+    """Scheduled posts kept in a Redis sorted set scored by publish time.
+
+    Post bodies live in one hash and each client has a sorted set of its own
+    IDs for listing, so scheduling and cancelling are O(log n). The
+    dispatcher pops due IDs in batches into a dispatching set and
+    acknowledges them once enqueued. IDs left there by a crashed dispatcher
+    become due again after ``lease`` seconds.
+    """
+
+    KEY_PREFIX = "scheduled_posts"
+
+    def __init__(self, redis_url, batch_size, lease):
+        self.redis = LazyClient(lambda: redis.StrictRedis.from_url(redis_url))
+        self.batch_size = batch_size
+        self.lease = lease
+        self._pop_due = LazyClient(lambda: self.redis.register_script(POP_DUE_SCRIPT))
+        self.queue_key = self.KEY_PREFIX
+        self.dispatching_key = f"{self.KEY_PREFIX}:dispatching"
+        self.data_key = f"{self.KEY_PREFIX}:data"
+
+    def _client_key(self, client_id: str) -> str:
+        return f"{self.KEY_PREFIX}:client:{client_id}"
+
+    def schedule(self, content: str, client_id: str, publish_at: float,
+                 platforms: Optional[List[str]] = None, media: Optional[List[dict]] = None) -> Dict[str, Any]:
+        """Stores a post, with any media, to publish at the given UNIX timestamp."""
+        post = {
+            "id": str(uuid.uuid4()),
+            "content": content,
+            "client_id": client_id,
+            "platforms": platforms,
+            "media": media,
+            "publish_at": publish_at,
+            "created_at": time.time()
+        }
+        pipe = self.redis.pipeline()
+        pipe.hset(self.data_key, post["id"], json.dumps(post, separators=(',', ':')))
+        pipe.zadd(self.queue_key, {post["id"]: publish_at})
+        pipe.zadd(self._client_key(client_id), {post["id"]: publish_at})
+        pipe.execute()
+        return post
+
+    def get(self, schedule_id: str) -> Optional[Dict[str, Any]]:
+        data = self.redis.hget(self.data_key, schedule_id)
+        return json.loads(data) if data else None
+
+    def cancel(self, schedule_id: str, client_id: str) -> Optional[bool]:
+        """Cancels a client's scheduled post.
+
+        Returns True when cancelled, False when it is already being
+        dispatched and None when the client has no such post.
+        """
+        post = self.get(schedule_id)
+        if post is None or post["client_id"] != client_id:
+            return None
+        if not self.redis.zrem(self.queue_key, schedule_id):
+            return False
+        pipe = self.redis.pipeline()
+        pipe.hdel(self.data_key, schedule_id)
+        pipe.zrem(self._client_key(client_id), schedule_id)
+        pipe.execute()
+        return True
+
+    def upcoming(self, client_id: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Lists a client's scheduled posts in publish order."""
+        ids = self.redis.zrange(self._client_key(client_id), offset, offset + limit - 1)
+        if not ids:
+            return []
+        return [json.loads(data) for data in self.redis.hmget(self.data_key, ids) if data]
+
+    def pop_due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Claims up to one batch of posts whose publish time has passed."""
+        now = time.time() if now is None else now
+        ids = self._pop_due(keys=[self.queue_key, self.dispatching_key], args=[now, self.batch_size, self.lease])
+        if not ids:
+            return []
+        posts = []
+        for schedule_id, data in zip(ids, self.redis.hmget(self.data_key, ids)):
+            if data:
+                posts.append(json.loads(data))
+            else:
+                self.redis.zrem(self.dispatching_key, schedule_id)
+        return posts
+
+    def ack(self, posts: List[Dict[str, Any]]) -> None:
+        """Forgets posts that have been handed to the workers."""
+        if not posts:
+            return
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.dispatching_key, *[post["id"] for post in posts])
+        pipe.hdel(self.data_key, *[post["id"] for post in posts])
+        for post in posts:
+            pipe.zrem(self._client_key(post["client_id"]), post["id"])
+        pipe.execute()
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zcard(self.queue_key)
+            pipe.zcount(self.queue_key, '-inf', time.time())
+            pipe.zcard(self.dispatching_key)
+            scheduled, due, dispatching = pipe.execute()
+        except RedisError as e:
+            logger.error(f"Redis error in post scheduler: {str(e)}")
+            return {}
+        return {"scheduled": scheduled, "due": due, "dispatching": dispatching}
+
+post_scheduler = PostScheduler(Config.REDIS_URL, Config.SCHEDULER_BATCH_SIZE, Config.SCHEDULER_LEASE)
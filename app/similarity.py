@@ -0,0 +1,189 @@
+# app/similarity.py
+
+import difflib
+import hashlib
+import re
+import string
+import time
+from typing import List, Optional, Tuple
+import redis
+from redis.exceptions import RedisError
+from .config import Config
+from .lazy import LazyClient
+from .metrics import near_duplicate_lookups, near_duplicate_lookup_seconds
+import logging
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+
+# Values that change between otherwise identical posts are folded into
+# placeholders before fingerprinting
+_URL = re.compile(r"https?://\S+|www\.\S+", re.IGNORECASE)
+_DATE = re.compile(
+    r"\b\d{4}-\d{1,2}-\d{1,2}\b|\b\d{1,2}/\d{1,2}(?:/\d{2,4})?\b|"
+    r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.? \d{1,2}(?:st|nd|rd|th)?\b",
+    re.IGNORECASE
+)
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_WORD = re.compile(r"[\w#@<>]+")
+
+def normalize(content: str) -> List[str]:
+    """Lower-cases content and replaces links, dates and numbers with placeholders."""
+    text = _URL.sub(" <url> ", content.lower())
+    text = _DATE.sub(" <date> ", text)
+    text = _NUMBER.sub(" <num> ", text)
+    return _WORD.findall(text)
+
+def simhash(tokens: List[str]) -> int:
+    """64-bit SimHash over word bigrams (single words for one-word content)."""
+    features = [" ".join(pair) for pair in zip(tokens, tokens[1:])] or tokens
+    weights = [0] * FINGERPRINT_BITS
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+def _strip(phrase: str) -> str:
+    return phrase.strip(string.punctuation + "…")
+
+def patch_variant(original: str, content: str, variant: str, max_edits: int) -> Optional[str]:
+    """Carries the edits that turn ``original`` into ``content`` over to ``variant``.
+
+    Every replaced or deleted phrase must appear exactly once in the variant
+    as a standalone phrase, and insertions cannot be placed, so anything
+    else returns None.
+    """
+    old, new = original.split(), content.split()
+    matcher = difflib.SequenceMatcher(a=old, b=new, autojunk=False)
+    edits = 0
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == 'equal':
+            continue
+        edits += max(i2 - i1, j2 - j1)
+        if op == 'insert' or edits > max_edits:
+            return None
+        before, after = _strip(" ".join(old[i1:i2])), _strip(" ".join(new[j1:j2]))
+        if before == after:
+            continue
+        if not before:
+            return None
+        # Match whole words only, so "5" cannot rewrite the "15" in "15%"
+        variant, count = re.subn(rf"(?<!\w){re.escape(before)}(?!\w)", lambda _: after, variant)
+        if count != 1:
+            return None
+    return variant
+
+class NearDuplicateIndex:
+    """Finds earlier optimizations of nearly identical content.
+
+    Content is fingerprinted with SimHash after folding links, dates and
+    numbers into placeholders. The fingerprint is split into
+    ``max_distance + 1`` bands, and each band indexes a Redis sorted set, so
+    any fingerprint within ``max_distance`` bits shares at least one bucket
+    with its match. Buckets keep only their newest ``bucket_size`` entries,
+    which keeps a lookup at a fixed two round trips however large the
+    index grows. A match's stored variant is reused after its edits are
+    patched in.
+    """
+
+    KEY_PREFIX = "near_dup"
+
+    def __init__(self, redis_url, threshold, ttl, bucket_size, max_edits, enabled=True):
+        self.redis = LazyClient(lambda: redis.StrictRedis.from_url(redis_url))
+        self.max_distance = int((1 - threshold) * FINGERPRINT_BITS)
+        self.bands = self.max_distance + 1
+        self.ttl = ttl
+        self.bucket_size = bucket_size
+        self.max_edits = max_edits
+        self.enabled = enabled
+
+    def _band_keys(self, fingerprint: int) -> List[str]:
+        keys = []
+        for band in range(self.bands):
+            start = band * FINGERPRINT_BITS // self.bands
+            end = (band + 1) * FINGERPRINT_BITS // self.bands
+            value = fingerprint >> start & ((1 << (end - start)) - 1)
+            keys.append(f"{self.KEY_PREFIX}:band:{band}:{value:x}")
+        return keys
+
+    def _entry_key(self, entry_id: str) -> str:
+        return f"{self.KEY_PREFIX}:entry:{entry_id}"
+
+    @staticmethod
+    def _entry_id(content: str) -> str:
+        return hashlib.sha256(" ".join(content.split()).encode('utf-8')).hexdigest()[:32]
+
+    def _candidates(self, fingerprint: int) -> List[Tuple[int, str]]:
+        """Returns (distance, entry ID) of indexed content within max_distance, closest first."""
+        pipe = self.redis.pipeline(transaction=False)
+        for key in self._band_keys(fingerprint):
+            pipe.zrevrange(key, 0, self.bucket_size - 1)
+        found = {}
+        for members in pipe.execute():
+            for member in members:
+                member = member.decode('utf-8')
+                distance = bin(int(member[:16], 16) ^ fingerprint).count('1')
+                if distance <= self.max_distance:
+                    found[member[16:]] = distance
+        return sorted((distance, entry_id) for entry_id, distance in found.items())
+
+    def lookup(self, content: str, field: str) -> Optional[str]:
+        """Returns the stored ``field`` variant of a near-duplicate, patched for this content."""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        result = 'miss'
+        try:
+            candidates = self._candidates(simhash(normalize(content)))[:3]
+            if not candidates:
+                return None
+            pipe = self.redis.pipeline(transaction=False)
+            for _, entry_id in candidates:
+                pipe.hmget(self._entry_key(entry_id), 'content', field)
+            for original, variant in pipe.execute():
+                if original is None or variant is None:
+                    continue
+                result = 'rejected'
+                patched = patch_variant(original.decode('utf-8'), content, variant.decode('utf-8'), self.max_edits)
+                if patched is not None:
+                    result = 'reused'
+                    return patched
+            return None
+        except RedisError as e:
+            logger.error(f"Redis error in near-duplicate index: {str(e)}")
+            result = 'error'
+            return None
+        finally:
+            near_duplicate_lookups.inc(result=result)
+            near_duplicate_lookup_seconds.observe(time.perf_counter() - start)
+
+    def add(self, content: str, field: str, variant: str) -> None:
+        """Indexes content with its optimized ``field`` variant."""
+        if not self.enabled:
+            return
+        fingerprint = simhash(normalize(content))
+        entry_id = self._entry_id(content)
+        member = f"{fingerprint:016x}{entry_id}"
+        now = time.time()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(self._entry_key(entry_id), mapping={'content': " ".join(content.split()), field: variant})
+            pipe.expire(self._entry_key(entry_id), self.ttl)
+            for key in self._band_keys(fingerprint):
+                pipe.zadd(key, {member: now})
+                pipe.zremrangebyrank(key, 0, -self.bucket_size - 1)
+                pipe.expire(key, self.ttl)
+            pipe.execute()
+        except RedisError as e:
+            logger.error(f"Redis error in near-duplicate index: {str(e)}")
+
+near_duplicate_index = NearDuplicateIndex(
+    Config.REDIS_URL,
+    Config.NEAR_DUP_THRESHOLD,
+    Config.NEAR_DUP_TTL,
+    Config.NEAR_DUP_BUCKET_SIZE,
+    Config.NEAR_DUP_MAX_EDITS,
+    Config.NEAR_DUP_ENABLED
+)
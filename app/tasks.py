@@ -1,9 +1,26 @@
 # app/tasks.py
 
-from celery import Celery
+from typing import Iterable, Optional, List
+import random
+import time
+import redis
+from celery import Celery, group
+from celery.signals import task_prerun, task_postrun, worker_init
+from celery.result import GroupResult
+from kombu import Queue
+from celery.states import READY_STATES
 from .config import Config
-from .utils import post_to_platform
+from .utils import post_to_platform, optimize_for_platforms, PLATFORM_CONSTRAINTS
+from .quota import quota_scheduler, platform_account, PlatformRateLimited
+from .resilience import circuit_breaker, retry_budget, is_transient, RETRY_POLICIES
+from .lazy import LazyClient
+from .scheduler import post_scheduler
+from .media import MediaProcessing
+from .insights import insights_warehouse, parse_timestamp
+from .threads_async import list_threads, get_insights_many
+from .metrics import metrics, platform_retries, task_runtime_seconds, queue_depth, scheduled_posts
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -13,14 +30,337 @@ celery = Celery(
     backend=Config.CELERY_RESULT_BACKEND
 )
 
-@celery.task(bind=True)
-def post_content_task(self, platform: str, content: str, client_id: str):
-    """Celery task to post content to a platform."""
+# Optimization and each platform's posts get their own queue so a slow
+# platform only backs up its own workers. On the Redis transport lower
+# priority values are consumed first.
+DEFAULT_QUEUE = 'celery'
+OPTIMIZE_QUEUE = 'optimize'
+PRIORITY_STEPS = [0, 3, 6, 9]
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 6
+
+def post_queue(platform: str) -> str:
+    return f"post.{platform.lower()}"
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """Routes optimization to its queue and posts to their platform's queue."""
+    if name.endswith('.optimize_crosspost_task'):
+        return {'queue': OPTIMIZE_QUEUE}
+    if name.endswith('.post_content_task'):
+        return {'queue': post_queue(kwargs.get('platform') or args[0])}
+    if name.endswith('.post_optimized_content_task'):
+        return {'queue': post_queue(kwargs.get('platform') or args[1])}
+    return None
+
+celery.conf.update(
+    task_default_queue=DEFAULT_QUEUE,
+    task_queues=[Queue(DEFAULT_QUEUE), Queue(OPTIMIZE_QUEUE)] + [
+        Queue(post_queue(platform)) for platform in PLATFORM_CONSTRAINTS
+    ],
+    task_routes=(route_task,),
+    task_default_priority=PRIORITY_INTERACTIVE,
+    broker_transport_options={
+        'priority_steps': PRIORITY_STEPS,
+        'sep': ':',
+        'queue_order_strategy': 'priority'
+    },
+    # Workers on the thread pool keep many posts in flight; prefetching one
+    # message per thread keeps a slow queue from hoarding work
+    worker_prefetch_multiplier=Config.CELERY_PREFETCH_MULTIPLIER
+)
+
+def _post_content(task, platform: str, content: str, client_id: str, attempt: int = 0,
+                  media: Optional[List[dict]] = None, reserved: bool = False):
+    """Posts content to a platform, retrying the calling task on failure.
+
+    ``attempt`` counts failed posts only; holds for quota or an open circuit
+    do not use up the platform's retries. ``reserved`` is set when a post
+    parked for throttling or media processing already spent its quota and
+    retry budget request, so resuming it does not spend them again.
+    """
+    # Park the task while the platform's circuit is open
+    wait = circuit_breaker.allow(platform)
+    if wait > 0:
+        logger.info(f"Parking {platform} post for client {client_id} for {wait:.0f}s while its circuit is open")
+        platform_retries.inc(platform=platform, reason='circuit_open')
+        raise task.retry(countdown=wait + random.uniform(0, 5))
+
+    if not reserved:
+        # Hold the task until the platform account has upstream capacity
+        wait = quota_scheduler.acquire(platform, platform_account(platform))
+        if wait > 0:
+            logger.info(f"Holding {platform} post for client {client_id} for {wait:.0f}s until quota resets")
+            platform_retries.inc(platform=platform, reason='quota')
+            raise task.retry(countdown=wait)
+
+        if attempt == 0:
+            retry_budget.record_request(platform)
+    parked = dict(task.request.kwargs or {}, reserved=True)
     try:
-        result = post_to_platform(platform, content)
+        result = post_to_platform(platform, content, media)
+        circuit_breaker.record(platform, success=True)
         logger.info(f"Posted to {platform} for client {client_id}")
         return result
+    except PlatformRateLimited as e:
+        logger.warning(f"{platform} throttled post for client {client_id}: {str(e)}")
+        platform_retries.inc(platform=platform, reason='rate_limited')
+        raise task.retry(exc=e, countdown=e.retry_after, kwargs=parked)
+    except MediaProcessing as e:
+        # Free the worker slot while the platform processes a video
+        logger.info(f"Parking {platform} post for client {client_id} for {e.retry_after:.0f}s while its media is processed")
+        platform_retries.inc(platform=platform, reason='media_processing')
+        raise task.retry(countdown=e.retry_after, kwargs=parked)
     except Exception as e:
         logger.error(f"Failed to post to {platform}: {str(e)}")
-        self.retry(exc=e, countdown=60, max_retries=3)
-        return {"error": str(e), "platform": platform}
\ No newline at end of file
+        if not is_transient(e):
+            raise
+        circuit_breaker.record(platform, success=False)
+
+        policy = RETRY_POLICIES[platform]
+        if attempt >= policy.max_retries:
+            raise
+        if not retry_budget.try_spend(platform):
+            logger.warning(f"{platform} retry budget exhausted, not retrying post for client {client_id}")
+            raise
+        platform_retries.inc(platform=platform, reason='error')
+        raise task.retry(exc=e, countdown=policy.backoff(attempt),
+                         kwargs=dict(task.request.kwargs or {}, attempt=attempt + 1, reserved=False))
+
+@worker_init.connect
+def _preload_worker(**kwargs):
+    """Warms shared state in the main worker process before the pool forks."""
+    from .preload import warm_up
+    warm_up()
+
+_task_started = {}
+
+@task_prerun.connect
+def _record_task_start(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+@task_postrun.connect
+def _record_task_runtime(task_id=None, task=None, state=None, **kwargs):
+    start = _task_started.pop(task_id, None)
+    if start is not None:
+        task_runtime_seconds.observe(time.perf_counter() - start, task=task.name, state=state or 'UNKNOWN')
+
+_broker = LazyClient(lambda: redis.StrictRedis.from_url(Config.CELERY_BROKER_URL, socket_timeout=1))
+
+def _collect_queue_depth():
+    """Reads the length of every Celery queue, across priorities, from the Redis broker."""
+    queues = [queue.name for queue in celery.conf.task_queues or []] or [celery.conf.task_default_queue]
+    pipe = _broker.pipeline(transaction=False)
+    for queue in queues:
+        for step in PRIORITY_STEPS:
+            pipe.llen(f"{queue}:{step}" if step else queue)
+    depths = iter(pipe.execute())
+    for queue in queues:
+        queue_depth.set(sum(next(depths) for _ in PRIORITY_STEPS), queue=queue)
+
+metrics.add_collector(_collect_queue_depth)
+
+def _collect_scheduled_posts():
+    for state, count in post_scheduler.stats().items():
+        scheduled_posts.set(count, state=state)
+
+metrics.add_collector(_collect_scheduled_posts)
+
+# Holds and error retries are bounded by _post_content, not by Celery's retry cap
+@celery.task(bind=True, max_retries=None)
+def post_content_task(self, platform: str, content: str, client_id: str, attempt: int = 0,
+                      media: Optional[List[dict]] = None, reserved: bool = False):
+    """Celery task to post content, and its media, to a platform."""
+    return _post_content(self, platform, content, client_id, attempt, media, reserved)
+
+@celery.task(bind=True, max_retries=None)
+def post_optimized_content_task(self, content: str, platform: str, client_id: str, attempt: int = 0,
+                                media: Optional[List[dict]] = None, reserved: bool = False):
+    """Celery task to post the output of optimize_crosspost_task, and its media, to a platform."""
+    return _post_content(self, platform, content, client_id, attempt, media, reserved)
+
+def crosspost_task_id(crosspost_id: str, platform: str, step: str) -> str:
+    """Returns the deterministic task ID of a cross-post pipeline step."""
+    return f"{crosspost_id}:{platform}:{step}"
+
+def optimize_task_id(crosspost_id: str) -> str:
+    """Returns the task ID of a cross-post's optimization, which covers every platform."""
+    return f"{crosspost_id}:optimize"
+
+@celery.task(bind=True)
+def optimize_crosspost_task(self, content: str, crosspost_id: str, client_id: str, platforms: List[str],
+                            priority: int = PRIORITY_INTERACTIVE, media: Optional[List[dict]] = None):
+    """Celery task to optimize content for every platform and enqueue each platform's post.
+
+    All platforms are optimized with one batched LLM call where possible.
+    Platforms that fail are retried twice, and those that still fail are
+    returned under ``errors``.
+    """
+    optimized, errors, _ = optimize_for_platforms(content, platforms)
+    for platform, variant in optimized.items():
+        post_optimized_content_task.apply_async(
+            (variant, platform, client_id), {"media": media},
+            task_id=crosspost_task_id(crosspost_id, platform, 'post'), priority=priority
+        )
+    if errors:
+        logger.error(f"Failed to optimize cross-post {crosspost_id} for {', '.join(errors)}: {errors}")
+        if self.request.retries < 2:
+            raise self.retry(countdown=10, max_retries=2,
+                             kwargs=dict(self.request.kwargs or {}, platforms=list(errors)))
+    return {"errors": errors}
+
+def _crosspost_pipeline(crosspost_id: str, content: str, client_id: str, platforms: List[str],
+                        priority: int = PRIORITY_INTERACTIVE, media: Optional[List[dict]] = None):
+    """Builds one cross-post's optimize task and the result group of its platform posts.
+
+    The optimize task enqueues the posts under deterministic IDs, so the
+    group can be saved before they exist. Each platform's post task uploads
+    the media itself, so the uploads to different platforms run in parallel
+    on their own queues.
+    """
+    signature = optimize_crosspost_task.signature(
+        (content, crosspost_id, client_id),
+        {"platforms": platforms, "priority": priority, "media": media},
+        task_id=optimize_task_id(crosspost_id), priority=priority
+    )
+    posts = GroupResult(crosspost_id, [
+        celery.AsyncResult(crosspost_task_id(crosspost_id, platform, 'post')) for platform in platforms
+    ], app=celery)
+    return signature, posts
+
+def enqueue_crosspost(content: str, client_id: str, platforms: Optional[Iterable[str]] = None,
+                      crosspost_id: Optional[str] = None, media: Optional[List[dict]] = None) -> GroupResult:
+    """Enqueues a cross-post's optimization, which fans out its posts, and saves the group of posts."""
+    crosspost_id = crosspost_id or str(uuid.uuid4())
+    platforms = list(platforms or PLATFORM_CONSTRAINTS.keys())
+    signature, result = _crosspost_pipeline(crosspost_id, content, client_id, platforms, media=media)
+    result.save()
+    signature.apply_async()
+    return result
+
+def enqueue_crosspost_batch(contents: Iterable[str], client_id: str, platforms: Optional[Iterable[str]] = None,
+                            media: Optional[List[Optional[List[dict]]]] = None) -> GroupResult:
+    """Enqueues the pipelines of several contents in one group.
+
+    Every optimize message is published through a single producer at bulk
+    priority. Each per-content cross-post is saved so its own ID can be
+    looked up, and the batch is saved as a nested group of them. ``media``
+    lists each content's media, if any.
+    """
+    platforms = list(platforms or PLATFORM_CONSTRAINTS.keys())
+    contents = list(contents)
+    items, signatures = [], []
+    for content, content_media in zip(contents, media or [None] * len(contents)):
+        signature, result = _crosspost_pipeline(str(uuid.uuid4()), content, client_id, platforms,
+                                                 PRIORITY_BULK, content_media)
+        result.save()
+        signatures.append(signature)
+        items.append(result)
+
+    batch = GroupResult(str(uuid.uuid4()), items, app=celery)
+    batch.save()
+    group(signatures).apply_async()
+    return batch
+
+def _pipeline_status(result: GroupResult) -> dict:
+    """Summarizes the optimize and post state of one cross-post."""
+    platforms = {}
+    optimize = celery.AsyncResult(optimize_task_id(result.id))
+    optimize_errors = optimize.result.get("errors", {}) if optimize.successful() else {}
+    for child in result.results:
+        platform = child.id.split(':')[1]
+        status = {"optimize": optimize.state, "post": child.state}
+        if optimize.failed():
+            status["error"] = str(optimize.result)
+        elif platform in optimize_errors:
+            status["optimize"] = "FAILURE"
+            status["error"] = optimize_errors[platform]
+        elif child.failed():
+            status["error"] = str(child.result)
+        elif child.successful():
+            status["result"] = child.result
+        platforms[platform] = status
+
+    failed = [p for p, status in platforms.items() if "error" in status]
+    if all(status["optimize"] == "PENDING" for status in platforms.values()):
+        state = "PENDING"
+    elif any(status["post"] not in READY_STATES and "error" not in status for status in platforms.values()):
+        state = "STARTED"
+    elif not failed:
+        state = "SUCCESS"
+    else:
+        state = "FAILURE" if len(failed) == len(platforms) else "PARTIAL"
+
+    return {"crosspost_id": result.id, "status": state, "platforms": platforms}
+
+def crosspost_status(crosspost_id: str) -> Optional[dict]:
+    """Gathers the state of every task in a cross-post pipeline or batch."""
+    result = GroupResult.restore(crosspost_id, app=celery)
+    if result is None:
+        return None
+    if not result.results or not isinstance(result.results[0], GroupResult):
+        return _pipeline_status(result)
+
+    items = [_pipeline_status(item) for item in result.results]
+    states = {item["status"] for item in items}
+    if len(states) == 1:
+        state = states.pop()
+    elif states & {"PENDING", "STARTED"}:
+        state = "STARTED"
+    else:
+        state = "PARTIAL"
+    return {"batch_id": crosspost_id, "status": state, "items": items}
+
+@celery.task
+def dispatch_scheduled_posts():
+    """Enqueues every scheduled post that is due, one batch at a time.
+
+    Each post keeps its schedule ID as its cross-post ID, so its status is
+    available under the same ID before and after dispatch.
+    """
+    dispatched = 0
+    for _ in range(Config.SCHEDULER_MAX_BATCHES):
+        posts = post_scheduler.pop_due()
+        if not posts:
+            break
+        enqueued = []
+        try:
+            for post in posts:
+                enqueue_crosspost(post["content"], post["client_id"], post["platforms"], crosspost_id=post["id"],
+                                  media=post.get("media"))
+                enqueued.append(post)
+        finally:
+            post_scheduler.ack(enqueued)
+        dispatched += len(posts)
+        if len(posts) < post_scheduler.batch_size:
+            break
+    if dispatched:
+        logger.info(f"Dispatched {dispatched} scheduled posts")
+    return dispatched
+
+@celery.task
+def harvest_thread_insights():
+    """Refreshes the insights warehouse with the threads that are due.
+
+    New threads are discovered from the newest one already stored, and only
+    threads whose refresh interval has elapsed are fetched, so each run
+    costs a bounded number of API calls however many threads exist.
+    """
+    since = insights_warehouse.latest_created_at()
+    discovered = insights_warehouse.add_threads(
+        (thread["id"], parse_timestamp(thread["timestamp"])) for thread in list_threads(since)
+    )
+    due = insights_warehouse.due_threads(Config.INSIGHTS_HARVEST_BATCH)
+    written = insights_warehouse.record(get_insights_many(due)) if due else 0
+    logger.info(f"Harvested insights for {len(due)} threads ({discovered} new, {written} changed metrics)")
+    return {"discovered": discovered, "harvested": len(due), "samples": written}
+
+celery.conf.beat_schedule = {
+    'dispatch-scheduled-posts': {
+        'task': dispatch_scheduled_posts.name,
+        'schedule': Config.SCHEDULER_INTERVAL
+    },
+    'harvest-thread-insights': {
+        'task': harvest_thread_insights.name,
+        'schedule': Config.INSIGHTS_HARVEST_INTERVAL
+    }
+}
@@ -29,10 +29,566 @@ def test_crosspost_invalid_content(client):
 
 def test_crosspost_valid_content(client, mocker):
     headers = {"X-API-Key": "testkey"}
+    mocker.patch('app.config.Config.OPTIMIZE_IN_WORKER', False)
+    mocker.patch('app.api.crosspost.idempotency_store.dedup_window', 0)
     mocker.patch('app.utils.optimize_content', return_value="Optimized content")
     mocker.patch('app.tasks.post_content_task.delay', return_value=type('obj', (object,), {'id': '123'})())
     response = client.post('/crosspost/', headers=headers, json={"content": "Valid content"})
     assert response.status_code == 202
     json_data = response.get_json()
     assert "message" in json_data
-    assert "tasks" in json_data
\ No newline at end of file
+    assert "tasks" in json_data
+
+def test_crosspost_enqueues_pipeline(client, mocker):
+    headers = {"X-API-Key": "testkey"}
+    child = type('obj', (object,), {'id': 'abc:Twitter:post'})()
+    result = type('obj', (object,), {'id': 'abc', 'results': [child]})()
+    enqueue = mocker.patch('app.api.crosspost.enqueue_crosspost', return_value=result)
+    mocker.patch('app.api.crosspost.idempotency_store.dedup_window', 0)
+    response = client.post('/crosspost/', headers=headers, json={"content": "Valid content"})
+    assert response.status_code == 202
+    json_data = response.get_json()
+    assert json_data["crosspost_id"] == "abc"
+    assert json_data["tasks"] == {"Twitter": "abc:Twitter:post"}
+    enqueue.assert_called_once_with("Valid content", "testkey", media=None)
+
+def test_crosspost_idempotency_replays_original_tasks(client, mocker):
+    import uuid
+
+    headers = {"X-API-Key": f"idem-{uuid.uuid4().hex}", "Idempotency-Key": "retry-1"}
+    child = type('obj', (object,), {'id': 'orig:Twitter:post'})()
+    result = type('obj', (object,), {'id': 'orig', 'results': [child]})()
+    enqueue = mocker.patch('app.api.crosspost.enqueue_crosspost', return_value=result)
+    first = client.post('/crosspost/', headers=headers, json={"content": "Valid content"})
+    second = client.post('/crosspost/', headers=headers, json={"content": "Valid content"})
+    assert first.status_code == second.status_code == 202
+    assert second.get_json()["crosspost_id"] == "orig"
+    assert second.get_json()["duplicate"] is True
+    assert second.headers["Idempotent-Replayed"] == "true"
+    enqueue.assert_called_once()
+
+    conflict = client.post('/crosspost/', headers=headers, json={"content": "Different content"})
+    assert conflict.status_code == 422
+
+def test_crosspost_duplicate_in_progress(client, mocker):
+    from app.idempotency import content_hash
+
+    pending = {"state": "pending", "content_hash": content_hash("Valid content")}
+    mocker.patch('app.api.crosspost.idempotency_store.claim', return_value=pending)
+    enqueue = mocker.patch('app.api.crosspost.enqueue_crosspost')
+    response = client.post('/crosspost/', headers={"X-API-Key": "testkey"}, json={"content": "Valid content"})
+    assert response.status_code == 409
+    enqueue.assert_not_called()
+
+def test_crosspost_status_not_found(client, mocker):
+    headers = {"X-API-Key": "testkey"}
+    mocker.patch('app.api.crosspost.crosspost_status', return_value=None)
+    response = client.get('/crosspost/unknown', headers=headers)
+    assert response.status_code == 404
+
+def test_optimize_for_platforms_partial_results(mocker):
+    import time
+    from app import utils
+
+    def fake_optimize(content, platform):
+        if platform == "LinkedIn":
+            raise RuntimeError("LLM unavailable")
+        time.sleep(0.2)
+        return f"{platform}: {content}"
+
+    mocker.patch('app.utils.local_variant', return_value=None)
+    mocker.patch('app.utils.optimize_content', side_effect=fake_optimize)
+    optimized, errors, timings = utils.optimize_for_platforms("Hello", timeout=5)
+    assert optimized == {"Twitter": "Twitter: Hello", "Threads": "Threads: Hello"}
+    assert errors == {"LinkedIn": "LLM unavailable"}
+    assert set(timings) == {"Twitter", "Threads", "LinkedIn"}
+    assert timings["LinkedIn"] < 100 <= timings["Twitter"]
+
+def test_parse_batch_response_flags_invalid_variants():
+    from app.utils import parse_batch_response
+
+    completion = 'Here you go: {"Twitter": "Short tweet", "Threads": "", "LinkedIn": "%s"}' % ("x" * 1301)
+    variants, failed = parse_batch_response(completion, ["Twitter", "Threads", "LinkedIn"])
+    assert variants == {"Twitter": "Short tweet"}
+    assert failed == ["Threads", "LinkedIn"]
+
+def test_optimize_for_platforms_batch_fallback(mocker):
+    import time
+    from app import utils
+
+    mocker.patch('app.utils.optimize_content_batch', return_value=({"Twitter": "Batched"}, ["Threads"]))
+    single = mocker.patch('app.utils.optimize_content', return_value="Single")
+    optimized, errors, _ = utils.optimize_for_platforms("Hello", ["Twitter", "Threads"])
+    assert optimized == {"Twitter": "Batched", "Threads": "Single"}
+    assert not errors
+    single.assert_called_once_with("Hello", "Threads")
+
+    def slow_batch(content, platforms):
+        time.sleep(0.5)
+        return {}, platforms
+
+    mocker.patch('app.utils.optimize_content_batch', side_effect=slow_batch)
+    optimized, errors, _ = utils.optimize_for_platforms("Hello", ["Twitter", "Threads"], timeout=0.3)
+    assert optimized == {"Twitter": "Single", "Threads": "Single"}
+    assert not errors
+
+def test_short_content_skips_the_llm(mocker):
+    from app import utils
+    from app.local_optimizer import format_for_platform, smart_truncate
+
+    llm = mocker.patch.object(utils, 'anthropic_client')
+    assert utils.optimize_content("Ship  it today!  #launch #dev #oss", "Twitter") == "Ship it today! #launch #dev #oss"
+    assert format_for_platform("Ship it today! #launch #dev #oss", 30, 2, " ") == ("Ship it today! #launch #dev", False)
+    assert utils.optimize_content("Ship it today! #launch", "Threads") == "Ship it today!\n\n#launch"
+    assert not llm.completions.create.called
+    assert smart_truncate("One sentence. Another sentence that runs long.", 20) == "One sentence."
+
+def test_stream_completion_stops_early(mocker):
+    from app import utils
+
+    sent = []
+
+    def events():
+        for token in ["Big news", " today!", " Read", " more", " below."] * 20:
+            sent.append(token)
+            yield type('obj', (object,), {'completion': token})()
+
+    create = mocker.patch.object(utils, 'anthropic_client').completions.create
+    create.side_effect = lambda **kwargs: events()
+    assert utils.stream_completion("prompt", 30) == ("Big news today!", "boundary")
+    assert len(sent) == 2
+
+    mocker.patch('app.config.Config.OPTIMIZE_STREAM_MIN_TAIL', 0)
+    assert utils.stream_completion("prompt", 30) == ("Big news today! Read more below.", "budget")
+    assert len(sent) == 7
+
+def test_near_duplicate_reuses_patched_variant():
+    from app.similarity import NearDuplicateIndex, patch_variant
+
+    index = NearDuplicateIndex('redis://localhost:6379/15', threshold=0.95, ttl=60, bucket_size=8, max_edits=4)
+    original = "Webinar on May 3 about faster uploads, sign up at https://ex.co/a today!"
+    index.add(original, "Twitter:v1", "Faster uploads webinar May 3! Sign up: https://ex.co/a")
+    edited = "Webinar on June 7 about faster uploads, sign up at https://ex.co/b today!"
+    assert index.lookup(edited, "Twitter:v1") == "Faster uploads webinar June 7! Sign up: https://ex.co/b"
+    assert index.lookup(edited, "Threads:v1") is None
+    assert index.lookup("Something else entirely about our hiring plans", "Twitter:v1") is None
+    assert patch_variant("Sale starts at 5 today", "Sale starts at 6 today",
+                         "Sale today: 15% off everything, from five!", 6) is None
+
+def test_optimization_cache_l1_hit_and_miss():
+    from app.cache import OptimizationCache
+
+    cache = OptimizationCache('redis://localhost:6379/15', ttl=60, max_entries=10, l1_size=1, l1_ttl=60)
+    key = OptimizationCache.make_key("Hello", "Twitter", "prompt", "model")
+    assert key != OptimizationCache.make_key("Hello", "Twitter", "prompt", "other-model")
+    cache.set(key, "Optimized")
+    assert cache.get(key) == "Optimized"
+    assert cache.stats()["l1_hits"] == 1
+
+def test_http_client_registry_reuses_sessions_per_platform():
+    from app.http_client import HTTPClientRegistry
+
+    registry = HTTPClientRegistry(pool_connections=1, pool_maxsize=2, pool_block=False, keepalive=True)
+    session = registry.get("Twitter")
+    assert registry.get("Twitter") is session
+    assert registry.get("LinkedIn") is not session
+    registry.reset()
+    assert registry.get("Twitter") is not session
+
+def test_rate_limit_headers():
+    from app.rate_limiter import RateLimitResult, rate_limit_headers
+
+    headers = rate_limit_headers(RateLimitResult(False, 100, 0, 12.3, 4.2))
+    assert headers["X-RateLimit-Limit"] == "100"
+    assert headers["X-RateLimit-Remaining"] == "0"
+    assert headers["X-RateLimit-Reset"] == "13"
+    assert headers["Retry-After"] == "5"
+    assert "Retry-After" not in rate_limit_headers(RateLimitResult(True, 100, 99, 60, 0))
+
+def test_leased_rate_limiter_decides_locally():
+    import uuid
+    from app.rate_limiter import LeasedRateLimiter, RateLimitResult, RedisRateLimiter
+
+    class CountingLimiter:
+        requests = 100
+        calls = 0
+
+        def reserve(self, client_id, cost=1, lease=0):
+            self.calls += 1
+            return RateLimitResult(True, 100, 50, 60, 0), lease
+
+    backend = CountingLimiter()
+    limiter = LeasedRateLimiter(backend, lease_size=20, lease_ttl=60)
+    results = [limiter.check("client") for _ in range(10)]
+    assert all(result.allowed for result in results)
+    assert backend.calls == 1
+
+    # Near the limit the script falls back to the exact cost in the same call
+    redis_limiter = RedisRateLimiter('redis://localhost:6379/15', requests=7, window=60)
+    client_id = f"lease-{uuid.uuid4().hex}"
+    reserved = [redis_limiter.reserve(client_id, 1, 4) for _ in range(4)]
+    assert [(result.allowed, leased) for result, leased in reserved] == [(True, 4), (True, 0), (True, 0), (False, 0)]
+
+    # A refill that no longer fits must not lock the client out of the rest of its quota
+    leased = LeasedRateLimiter(RedisRateLimiter('redis://localhost:6379/15', requests=20, window=60),
+                               lease_size=8, lease_ttl=60)
+    client_id = f"lease-{uuid.uuid4().hex}"
+    allowed = []
+    for _ in range(21):
+        allowed.append(leased.check(client_id).allowed)
+        leased._refiller.submit(lambda: None).result()
+    assert allowed == [True] * 20 + [False]
+
+def test_quota_scheduler_reads_retry_after(mocker):
+    from app.quota import PlatformQuotaScheduler, parse_retry_after
+
+    scheduler = PlatformQuotaScheduler('redis://localhost:6379/15')
+    mocker.patch.object(scheduler, 'redis')
+    response = type('obj', (object,), {'status_code': 429, 'headers': {'retry-after': '120'}})()
+    assert scheduler.record("LinkedIn", "account", response) == 120.0
+    unavailable = type('obj', (object,), {'status_code': 503, 'headers': {}})()
+    assert not scheduler.record("LinkedIn", "account", unavailable)
+    unavailable.headers = {'retry-after': '30'}
+    assert scheduler.record("LinkedIn", "account", unavailable) == 30.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+
+def test_content_validator_prohibited_terms_and_batch():
+    from app.validation import ContentValidator, build_trie_pattern
+
+    pattern = build_trie_pattern(["bad", "badword", "worse"])
+    assert pattern.search("this is badword here")
+    assert pattern.search("even worse")
+    assert not pattern.search("all good")
+
+    validator = ContentValidator(["spam"], ["en"])
+    results = validator.validate_many(["Nice post", "Buy spam now", "", "Nice post"])
+    assert results[0] == (True, None)
+    assert results[1] == (False, "Content contains prohibited language")
+    assert results[2] == (False, "Content cannot be empty")
+    assert results[3] == results[0]
+
+def test_crosspost_batch_dedupes_and_reports_invalid(client, mocker):
+    import time
+
+    headers = {"X-API-Key": "testkey"}
+    crosspost = type('obj', (object,), {'id': 'cp1', 'results': [type('obj', (object,), {'id': 'cp1:Twitter:post'})()]})()
+    batch = type('obj', (object,), {'id': 'batch1', 'results': [crosspost]})()
+    enqueue = mocker.patch('app.api.crosspost.enqueue_crosspost_batch', return_value=batch)
+    posts = [{"content": "Valid content"}, {"content": ""}, {"content": "Valid content"}]
+    response = client.post('/crosspost/batch', headers=headers, json={"posts": posts})
+    assert response.status_code == 202
+    items = response.get_json()["items"]
+    assert items["0"]["status"] == "enqueued"
+    assert items["1"]["status"] == "invalid"
+    assert items["2"]["status"] == "duplicate"
+    assert items["2"]["tasks"] == {"Twitter": "cp1:Twitter:post"}
+    enqueue.assert_called_once_with(["Valid content"], "testkey", media=[None])
+
+    # The same content at another time is a separate post, scheduled rather than enqueued
+    enqueue.reset_mock()
+    schedule = mocker.patch('app.api.crosspost.post_scheduler.schedule', return_value={"id": "s1"})
+    posts = [{"content": "Valid content", "publish_at": "2999-01-01T09:00:00Z"},
+             {"content": "Valid content", "publish_at": time.time() + 3600}, {"content": "Valid content"}]
+    items = client.post('/crosspost/batch', headers=headers, json={"posts": posts}).get_json()["items"]
+    assert [items[str(i)]["status"] for i in range(3)] == ["invalid", "scheduled", "enqueued"]
+    schedule.assert_called_once()
+    enqueue.assert_called_once_with(["Valid content"], "testkey", media=[None])
+
+def test_crosspost_batch_items_can_be_looked_up(mocker):
+    from celery.backends.cache import CacheBackend
+    from app import tasks
+
+    mocker.patch.object(type(tasks.celery), 'backend', new=CacheBackend(app=tasks.celery, backend='memory'))
+    mocker.patch('app.tasks.group.apply_async')
+    batch = tasks.enqueue_crosspost_batch(["One", "Two"], "client", platforms=["Twitter"])
+    status = tasks.crosspost_status(batch.id)
+    assert [item["crosspost_id"] for item in status["items"]] == [item.id for item in batch.results]
+    item = tasks.crosspost_status(batch.results[1].id)
+    assert item["status"] == "PENDING" and list(item["platforms"]) == ["Twitter"]
+
+def test_media_upload_is_cached_by_content_hash(tmp_path, mocker):
+    import time
+    from app import media
+
+    mocker.patch('app.config.Config.MEDIA_ROOT', str(tmp_path))
+    (tmp_path / "photo.png").write_bytes(b"\x89PNG" + b"0" * 10)
+    assert media.resolve_media([{"path": "../photo.png"}])[1] == "Media not found: ../photo.png"
+    assert [offset for offset, _ in media.iter_chunks(str(tmp_path / "photo.png"), 4)] == [0, 4, 8, 12]
+
+    upload = mocker.Mock(side_effect=[("m1", None), media.MediaProcessing("Twitter", "m2", 5)])
+    mocker.patch.dict(media.UPLOADERS, {"Twitter": upload})
+    uploader = media.MediaUploader('redis://localhost:6379/15', ttl=60, max_workers=2, processing_timeout=60)
+    items = [{"path": "photo.png", "alt_text": "A photo"}]
+    assert uploader.upload_all("Twitter", items) == [media.UploadedMedia("m1", "image", "A photo")]
+    assert uploader.upload_all("Twitter", items)[0].media_id == "m1"
+    upload.assert_called_once()
+
+    # Twitter binds alt text at upload, so new alt text is a new upload; one
+    # still processing is checked on again instead of uploaded twice
+    items = [{"path": "photo.png", "alt_text": f"Another photo {time.time()}"}]
+    with pytest.raises(media.MediaProcessing):
+        uploader.upload_all("Twitter", items)
+    mocker.patch.dict(media.PROCESSING_CHECKS, {"Twitter": mocker.Mock(return_value=None)})
+    assert uploader.upload_all("Twitter", items)[0].media_id == "m2"
+    assert upload.call_count == 2
+    media.PROCESSING_CHECKS["Twitter"].assert_called_once_with("m2")
+
+def test_async_threads_client_paginates_and_reports_errors():
+    import asyncio
+    import httpx
+    from app.threads_async import AsyncThreadsClient
+
+    def handler(request):
+        if request.url.path.endswith("/missing/replies"):
+            return httpx.Response(404, json={"error": "not found"})
+        if request.url.params.get("after") == "1":
+            return httpx.Response(200, json={"data": [{"id": "r2"}]})
+        return httpx.Response(200, json={"data": [{"id": "r1"}], "paging": {"cursors": {"after": "1"}, "next": "more"}})
+
+    async def run():
+        async with AsyncThreadsClient("https://threads.test/v1/threads", "token", transport=httpx.MockTransport(handler)) as client:
+            return await client.get_replies_many(["t1", "missing"])
+
+    results = asyncio.run(run())
+    assert results["t1"] == {"data": [{"id": "r1"}, {"id": "r2"}]}
+    assert "error" in results["missing"]
+
+def test_insights_warehouse_harvests_incrementally(tmp_path, client, mocker):
+    from app.insights import InsightsWarehouse
+
+    day = 86400
+    warehouse = InsightsWarehouse(str(tmp_path / "insights.db"), min_refresh=3600, max_refresh=7 * day, max_age=90 * day)
+    assert warehouse.add_threads([("t1", 0), ("t2", 0)]) == 2
+    assert warehouse.add_threads([("t1", 0)]) == 0
+
+    views = lambda n: {"data": [{"name": "views", "values": [{"value": n}]}]}
+    assert warehouse.record({"t1": views(10), "t2": views(5)}, now=2 * day) == 2
+    assert warehouse.due_threads(10, now=2 * day + 3600) == []
+    assert warehouse.due_threads(10, now=2 * day + 7200) == ["t1", "t2"]
+    assert warehouse.record({"t1": views(25), "t2": views(5)}, now=3 * day) == 1
+    # t2 did not change, so its refresh interval doubled
+    assert warehouse.due_threads(10, now=3 * day + 3 * 3600) == ["t1"]
+
+    summary = warehouse.summary("views", interval="day")
+    assert summary["totals"] == {"views": 30}
+    assert summary["series"] == [{"t": 2 * day, "value": 15}, {"t": 3 * day, "value": 15}]
+    assert summary["top"][0] == {"thread_id": "t1", "value": 25}
+
+    mocker.patch('app.api.threads_endpoints.insights_warehouse', warehouse)
+    response = client.get('/threads/insights/summary?interval=hour&top=1', headers={"X-API-Key": "testkey"})
+    assert response.status_code == 200
+    assert response.get_json()["threads"] == 2
+    assert client.get('/threads/insights/summary?interval=year').status_code == 400
+
+def test_thread_insights_cached_with_etag(client, mocker):
+    import threading
+    from app.threads import response_cache
+
+    headers = {"X-API-Key": "testkey"}
+    fetch = mocker.patch.object(response_cache, 'fetch', return_value=(200, {"views": 10}, '"abc"'))
+    response = client.get('/threads/t-etag/insights', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json() == {"views": 10}
+    etag = response.headers["ETag"]
+
+    response = client.get('/threads/t-etag/insights', headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    fetch.assert_called_once()
+
+    # Writes made outside a request, e.g. from a worker, still drop the entry
+    writer = threading.Thread(target=response_cache.invalidate, args=('t-etag',))
+    writer.start()
+    writer.join()
+    assert client.get('/threads/t-etag/insights', headers=headers).status_code == 200
+    assert fetch.call_count == 2
+
+def test_thread_replies_stream_ndjson(client, mocker):
+    headers = {"X-API-Key": "testkey"}
+    mocker.patch('app.api.threads_endpoints.iter_replies', return_value=iter([{"id": "r1"}, {"id": "r2"}]))
+    response = client.get('/threads/t1/replies?stream=1', headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.get_data(as_text=True) == '{"id": "r1"}\n{"id": "r2"}\n'
+
+def test_metrics_registry_aggregates_and_renders():
+    from app.metrics import MetricsRegistry
+
+    registry = MetricsRegistry('redis://localhost:6379/15', flush_interval=60)
+    registry.redis.delete('metrics:test_posts_total', 'metrics:test_latency_seconds')
+    posts = registry.counter('test_posts_total', 'Posts', ('platform',))
+    latency = registry.histogram('test_latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    posts.inc(platform="Twitter")
+    posts.inc(2, platform="Twitter")
+    latency.observe(0.05)
+    latency.observe(5)
+    text = registry.render()
+    assert 'test_posts_total{platform="Twitter"} 3' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 2' in text
+    assert 'test_latency_seconds_count 2' in text
+
+def test_metrics_endpoint(client):
+    response = client.get('/health/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE crosspost_llm_request_seconds histogram' in response.get_data(as_text=True)
+
+def test_import_is_lazy_and_fast():
+    import subprocess
+    import sys
+
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "from app import create_app\n"
+        "create_app()\n"
+        "elapsed = time.perf_counter() - start\n"
+        "from app.utils import anthropic_client, optimization_cache\n"
+        "assert 'anthropic' not in sys.modules and 'langdetect' not in sys.modules\n"
+        "assert not anthropic_client.initialized and not optimization_cache.redis.initialized\n"
+        "print(elapsed)\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert float(result.stdout.strip().splitlines()[-1]) < 2.0
+
+def test_circuit_breaker_opens_and_probes():
+    import time
+    import uuid
+    from app.resilience import CircuitBreaker
+
+    breaker = CircuitBreaker('redis://localhost:6379/15', failure_threshold=2, failure_window=60,
+                             cooldown=0.05, probe_timeout=60)
+    platform = f"test-{uuid.uuid4().hex}"
+    breaker.record(platform, success=False)
+    assert breaker.allow(platform) == 0
+    breaker.record(platform, success=False)
+    assert breaker.allow(platform) > 0
+    assert breaker.states([platform])[platform]["state"] == "open"
+
+    time.sleep(0.1)
+    assert breaker.allow(platform) == 0  # the half-open probe
+    assert breaker.allow(platform) > 0
+    breaker.record(platform, success=True)
+    assert breaker.states([platform])[platform] == {"state": "closed", "failures": 0}
+
+def test_post_scheduler_pops_due_posts_and_cancels():
+    import time
+    import uuid
+    from app.scheduler import PostScheduler
+
+    scheduler = PostScheduler('redis://localhost:6379/15', batch_size=10, lease=60)
+    client_id = f"client-{uuid.uuid4().hex}"
+    due = scheduler.schedule("Due post", client_id, time.time() - 1)
+    later = scheduler.schedule("Later post", client_id, time.time() + 3600)
+    assert [post["id"] for post in scheduler.upcoming(client_id)] == [due["id"], later["id"]]
+
+    popped = scheduler.pop_due()
+    assert due["id"] in [post["id"] for post in popped]
+    assert later["id"] not in [post["id"] for post in popped]
+    assert scheduler.cancel(due["id"], client_id) is False
+    scheduler.ack(popped)
+    assert scheduler.cancel(later["id"], "other-client") is None
+    assert scheduler.cancel(later["id"], client_id) is True
+    assert scheduler.upcoming(client_id) == []
+
+def test_crosspost_schedules_future_posts(client, mocker):
+    from datetime import datetime, timedelta, timezone
+
+    headers = {"X-API-Key": "testkey"}
+    tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    enqueue = mocker.patch('app.api.crosspost.enqueue_crosspost')
+    response = client.post('/crosspost/', headers=headers,
+                           json={"content": "Valid content", "publish_at": "2999-01-01T09:00:00Z"})
+    assert response.status_code == 400  # beyond the scheduling horizon
+
+    response = client.post('/crosspost/', headers=headers,
+                           json={"content": "Valid content", "publish_at": tomorrow})
+    assert response.status_code == 202
+    crosspost_id = response.get_json()["crosspost_id"]
+    enqueue.assert_not_called()
+
+    mocker.patch('app.api.crosspost.crosspost_status', return_value=None)
+    status = client.get(f'/crosspost/{crosspost_id}', headers=headers).get_json()
+    assert status["status"] == "SCHEDULED"
+    assert client.delete(f'/crosspost/scheduled/{crosspost_id}', headers=headers).status_code == 200
+
+def test_tasks_are_routed_to_platform_queues():
+    from app.tasks import celery, post_content_task, post_optimized_content_task, optimize_crosspost_task
+
+    router = celery.amqp.router
+    assert router.route({}, post_content_task.name, args=("LinkedIn", "Hi", "c"))['queue'].name == 'post.linkedin'
+    assert router.route({}, post_optimized_content_task.name, args=("Hi", "Twitter", "c"))['queue'].name == 'post.twitter'
+    assert router.route({}, optimize_crosspost_task.name, args=("Hi", "x1", "c"))['queue'].name == 'optimize'
+
+def test_crosspost_optimizes_once_and_fans_out_posts(mocker):
+    from app import tasks
+
+    optimize = mocker.patch('app.tasks.optimize_for_platforms', side_effect=[
+        ({"Twitter": "Tweet"}, {"LinkedIn": "timeout"}, {}),
+        ({"LinkedIn": "Post"}, {}, {})
+    ])
+    post = mocker.patch.object(tasks.post_optimized_content_task, 'apply_async')
+    result = tasks.optimize_crosspost_task.apply(args=("Hello", "x1", "client"),
+                                                 kwargs={"platforms": ["Twitter", "LinkedIn"]})
+    assert result.get() == {"errors": {}}
+    assert [call.args[1] for call in optimize.call_args_list] == [["Twitter", "LinkedIn"], ["LinkedIn"]]
+    assert [call.args[0] for call in post.call_args_list] == [("Tweet", "Twitter", "client"), ("Post", "LinkedIn", "client")]
+    assert post.call_args_list[0].kwargs["task_id"] == tasks.crosspost_task_id("x1", "Twitter", "post")
+
+def test_post_task_survives_more_holds_than_celery_retries(mocker):
+    from app import tasks
+
+    mocker.patch.object(tasks.circuit_breaker, 'allow', return_value=0)
+    mocker.patch.object(tasks.circuit_breaker, 'record')
+    mocker.patch.object(tasks.retry_budget, 'record_request')
+    acquire = mocker.patch.object(tasks.quota_scheduler, 'acquire', side_effect=[30] * 5 + [0])
+    mocker.patch('app.tasks.post_to_platform', return_value={"id": "p1"})
+    result = tasks.post_content_task.apply(args=("Twitter", "Hello", "client"))
+    assert result.get() == {"id": "p1"}
+    assert acquire.call_count == 6
+
+def test_post_task_parks_do_not_spend_quota_again(mocker):
+    from app import tasks
+    from app.media import MediaProcessing
+    from app.quota import PlatformRateLimited
+
+    mocker.patch.object(tasks.circuit_breaker, 'allow', return_value=0)
+    mocker.patch.object(tasks.circuit_breaker, 'record')
+    record_request = mocker.patch.object(tasks.retry_budget, 'record_request')
+    acquire = mocker.patch.object(tasks.quota_scheduler, 'acquire', return_value=0)
+    post = mocker.patch('app.tasks.post_to_platform', side_effect=[
+        MediaProcessing("Twitter", "m1", 5), PlatformRateLimited("Twitter", 30), {"id": "p1"}
+    ])
+    result = tasks.post_content_task.apply(args=("Twitter", "Hello", "client"))
+    assert result.get() == {"id": "p1"}
+    assert post.call_count == 3
+    assert acquire.call_count == 1 and record_request.call_count == 1
+
+def test_post_task_holds_leave_error_retries_alone(mocker):
+    import requests
+    from app import tasks, utils
+
+    mocker.patch.object(tasks.circuit_breaker, 'allow', side_effect=[0, 30, 30, 30, 30, 0, 0, 0])
+    record = mocker.patch.object(tasks.circuit_breaker, 'record')
+    mocker.patch.object(tasks.retry_budget, 'record_request')
+    spend = mocker.patch.object(tasks.retry_budget, 'try_spend', return_value=True)
+    mocker.patch.object(tasks.quota_scheduler, 'acquire', return_value=0)
+    # Two error retries are allowed; the four circuit holds between them must not count
+    mocker.patch.dict(tasks.RETRY_POLICIES, {"Twitter": tasks.RETRY_POLICIES["Twitter"]._replace(max_retries=2)})
+    post = mocker.patch('app.tasks.post_to_platform', side_effect=[
+        requests.exceptions.ConnectionError("reset"), requests.exceptions.ConnectionError("reset"), {"id": "p1"}
+    ])
+    result = tasks.post_content_task.apply(args=("Twitter", "Hello", "client"))
+    assert result.get() == {"id": "p1"}
+    assert post.call_count == 3 and spend.call_count == 2
+    assert [call.kwargs["success"] for call in record.call_args_list] == [False, False, True]
+
+    # A 503 is an outage for the breaker and retry budget, not a quota hold
+    response = mocker.Mock(status_code=503, headers={"retry-after": "30"})
+    response.raise_for_status.side_effect = requests.exceptions.HTTPError(response=response)
+    mocker.patch.object(utils.http_clients, 'get').return_value.post.return_value = response
+    mocker.patch.object(utils.quota_scheduler, 'record', return_value=30.0)
+    with pytest.raises(requests.exceptions.HTTPError):
+        utils.post_to_twitter("Hello")
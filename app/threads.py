@@ -2,28 +2,42 @@
 
 import requests
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 from .config import Config
-from .utils import requests_retry_session
+from .cache import cache
+from .http_client import http_clients
+from .response_cache import ThreadResponseCache
 
 logger = logging.getLogger(__name__)
 
-def get_thread_replies(thread_id: str) -> Dict[str, Any]:
-    """Fetch replies to a specific thread."""
+def fetch_thread_resource(thread_id: str, resource: str, etag: Optional[str] = None) -> Tuple[int, Any, Optional[str]]:
+    """Conditionally fetch a thread resource, returning (status, body, etag)."""
     try:
         headers = {
             "Authorization": f"Bearer {Config.THREADS_ACCESS_TOKEN}",
             "Content-Type": "application/json"
         }
-        url = f"{Config.THREADS_API_URL}/{thread_id}/replies"
-        session = requests_retry_session()
+        if etag:
+            headers["If-None-Match"] = etag
+        url = f"{Config.THREADS_API_URL}/{thread_id}/{resource}"
+        session = http_clients.get("Threads")
         response = session.get(url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            return 304, None, etag
         response.raise_for_status()
-        return response.json()
+        return response.status_code, response.json(), response.headers.get("ETag")
     except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching replies for thread {thread_id}: {str(e)}")
+        logger.error(f"Error fetching {resource} for thread {thread_id}: {str(e)}")
         raise
 
+# Read-through cache for replies and insights, invalidated on writes
+response_cache = ThreadResponseCache(
+    cache,
+    fetch_thread_resource,
+    {"replies": Config.THREADS_REPLIES_CACHE_TTL, "insights": Config.THREADS_INSIGHTS_CACHE_TTL},
+    Config.THREADS_CACHE_STALE_TTL
+)
+
 def reply_to_thread(thread_id: str, message: str) -> Dict[str, Any]:
     """Post a reply to a specific thread."""
     try:
@@ -35,9 +49,10 @@ def reply_to_thread(thread_id: str, message: str) -> Dict[str, Any]:
             "content": message
         }
         url = f"{Config.THREADS_API_URL}/{thread_id}/replies"
-        session = requests_retry_session()
+        session = http_clients.get("Threads")
         response = session.post(url, headers=headers, json=payload, timeout=10)
         response.raise_for_status()
+        response_cache.invalidate(thread_id)
         return response.json()
     except requests.exceptions.RequestException as e:
         logger.error(f"Error posting reply to thread {thread_id}: {str(e)}")
@@ -51,30 +66,15 @@ def delete_thread_reply(thread_id: str, reply_id: str) -> Dict[str, Any]:
             "Content-Type": "application/json"
         }
         url = f"{Config.THREADS_API_URL}/{thread_id}/replies/{reply_id}"
-        session = requests_retry_session()
+        session = http_clients.get("Threads")
         response = session.delete(url, headers=headers, timeout=10)
         response.raise_for_status()
+        response_cache.invalidate(thread_id)
         return response.json()
     except requests.exceptions.RequestException as e:
         logger.error(f"Error deleting reply {reply_id} from thread {thread_id}: {str(e)}")
         raise
 
-def get_thread_insights(thread_id: str) -> Dict[str, Any]:
-    """Fetch insights for a specific thread."""
-    try:
-        headers = {
-            "Authorization": f"Bearer {Config.THREADS_ACCESS_TOKEN}",
-            "Content-Type": "application/json"
-        }
-        url = f"{Config.THREADS_API_URL}/{thread_id}/insights"
-        session = requests_retry_session()
-        response = session.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching insights for thread {thread_id}: {str(e)}")
-        raise
-
 def publish_thread(content: str) -> Dict[str, Any]:
     """Publish new content to Threads."""
     try:
@@ -86,7 +86,7 @@ def publish_thread(content: str) -> Dict[str, Any]:
             "content": content
         }
         url = Config.THREADS_API_URL
-        session = requests_retry_session()
+        session = http_clients.get("Threads")
         response = session.post(url, headers=headers, json=payload, timeout=10)
         response.raise_for_status()
         return response.json()
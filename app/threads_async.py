@@ -0,0 +1,184 @@
+# app/threads_async.py
+
+import asyncio
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+import httpx
+from .config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AsyncThreadsClient:
+    """Asyncio Threads API client with bounded concurrency and connection reuse."""
+
+    def __init__(self, base_url=None, access_token=None, concurrency=None, timeout=10.0, transport=None):
+        self.base_url = (base_url or Config.THREADS_API_URL).rstrip('/')
+        self.access_token = access_token or Config.THREADS_ACCESS_TOKEN
+        self.concurrency = concurrency or Config.THREADS_ASYNC_CONCURRENCY
+        self.timeout = timeout
+        self.transport = transport
+        self._client = None
+        self._semaphore = None
+
+    async def open(self) -> None:
+        if self._client is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._client = httpx.AsyncClient(
+                headers={
+                    "Authorization": f"Bearer {self.access_token}",
+                    "Content-Type": "application/json"
+                },
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency
+                ),
+                timeout=self.timeout,
+                transport=self.transport
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        await self.open()
+        async with self._semaphore:
+            url = f"{self.base_url}/{path}" if path else self.base_url
+            response = await self._client.request(method, url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_thread_replies(self, thread_id: str, after: Optional[str] = None,
+                                 limit: Optional[int] = None) -> Dict[str, Any]:
+        """Fetch one page of replies to a thread."""
+        params = {}
+        if after:
+            params["after"] = after
+        if limit:
+            params["limit"] = limit
+        return await self._request("GET", f"{thread_id}/replies", params=params)
+
+    async def iter_replies(self, thread_id: str, page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every reply to a thread, following pagination cursors lazily."""
+        after = None
+        while True:
+            page = await self.get_thread_replies(thread_id, after=after, limit=page_size)
+            for reply in page.get("data", []):
+                yield reply
+            paging = page.get("paging") or {}
+            after = (paging.get("cursors") or {}).get("after")
+            if not paging.get("next") or not after:
+                break
+
+    async def list_threads(self, since: Optional[int] = None, page_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Fetch the account's threads published since a Unix time, following pagination cursors."""
+        params = {"fields": "id,timestamp"}
+        if since:
+            params["since"] = since
+        if page_size:
+            params["limit"] = page_size
+        threads = []
+        while True:
+            page = await self._request("GET", "", params=params)
+            threads.extend(page.get("data", []))
+            paging = page.get("paging") or {}
+            after = (paging.get("cursors") or {}).get("after")
+            if not paging.get("next") or not after:
+                return threads
+            params["after"] = after
+
+    async def get_thread_insights(self, thread_id: str) -> Dict[str, Any]:
+        """Fetch insights for a thread."""
+        return await self._request("GET", f"{thread_id}/insights")
+
+    async def reply_to_thread(self, thread_id: str, message: str) -> Dict[str, Any]:
+        """Post a reply to a thread."""
+        return await self._request("POST", f"{thread_id}/replies", json={"content": message})
+
+    async def delete_thread_reply(self, thread_id: str, reply_id: str) -> Dict[str, Any]:
+        """Delete a reply from a thread."""
+        return await self._request("DELETE", f"{thread_id}/replies/{reply_id}")
+
+    async def _many(self, ids: Iterable[str], fetch) -> Dict[str, Any]:
+        ids = list(dict.fromkeys(ids))
+        results = await asyncio.gather(*(fetch(thread_id) for thread_id in ids), return_exceptions=True)
+        output = {}
+        for thread_id, result in zip(ids, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error fetching thread {thread_id}: {str(result)}")
+                output[thread_id] = {"error": str(result)}
+            else:
+                output[thread_id] = result
+        return output
+
+    async def get_insights_many(self, ids: Iterable[str]) -> Dict[str, Any]:
+        """Fetch insights for many threads concurrently; failures are reported per ID."""
+        return await self._many(ids, self.get_thread_insights)
+
+    async def get_replies_many(self, ids: Iterable[str]) -> Dict[str, Any]:
+        """Fetch every reply of many threads concurrently; failures are reported per ID."""
+        async def fetch_all(thread_id):
+            return {"data": [reply async for reply in self.iter_replies(thread_id)]}
+        return await self._many(ids, fetch_all)
+
+class _BackgroundLoop:
+    """Event loop on a daemon thread that keeps one client alive per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._client = None
+
+    def _start(self) -> AsyncThreadsClient:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='threads-async', daemon=True).start()
+                self._client = AsyncThreadsClient()
+                self._pid = os.getpid()
+        return self._client
+
+    def run(self, method: str, *args):
+        future = asyncio.run_coroutine_threadsafe(getattr(self._start(), method)(*args), self._loop)
+        return future.result()
+
+    def iterate(self, method: str, *args) -> Iterator[Any]:
+        """Yields the items of an async generator method as the loop produces them."""
+        items = getattr(self._start(), method)(*args)
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(items.__anext__(), self._loop).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            asyncio.run_coroutine_threadsafe(items.aclose(), self._loop).result()
+
+_background = _BackgroundLoop()
+
+def get_insights_many(ids: Iterable[str]) -> Dict[str, Any]:
+    """Sync wrapper around AsyncThreadsClient.get_insights_many."""
+    return _background.run("get_insights_many", list(ids))
+
+def get_replies_many(ids: Iterable[str]) -> Dict[str, Any]:
+    """Sync wrapper around AsyncThreadsClient.get_replies_many."""
+    return _background.run("get_replies_many", list(ids))
+
+def iter_replies(thread_id: str, page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Sync wrapper around AsyncThreadsClient.iter_replies; pages are fetched as replies are consumed."""
+    return _background.iterate("iter_replies", thread_id, page_size)
+
+def list_threads(since: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Sync wrapper around AsyncThreadsClient.list_threads."""
+    return _background.run("list_threads", since)
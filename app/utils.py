@@ -1,24 +1,53 @@
 # app/utils.py
 
-import re
-from typing import Tuple, Optional
-from langdetect import detect, LangDetectException
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, TimeoutError as FutureTimeoutError
+from typing import Tuple, Optional, Dict, Iterable, List
 import logging
 from .config import Config
-import anthropic
-from functools import lru_cache
+from .lazy import LazyClient
+from .cache import OptimizationCache
+from .similarity import near_duplicate_index
+from .media import media_uploader, UploadedMedia
+from .validation import content_validator
+from .http_client import http_clients
+from .quota import quota_scheduler, platform_account, PlatformRateLimited
+from .local_optimizer import optimize_locally, smart_truncate, SENTENCE_ENDINGS
+from .metrics import record_llm_usage, platform_request_seconds, optimize_paths, llm_stream_stops
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 logger = logging.getLogger(__name__)
 
-# Initialize Anthropic client
-anthropic_client = anthropic.Anthropic(api_key=Config.ANTHROPIC_API_KEY)
+def _create_anthropic_client():
+    import anthropic
+
+    return anthropic.Anthropic(api_key=Config.ANTHROPIC_API_KEY, base_url=Config.ANTHROPIC_BASE_URL)
+
+# Anthropic client, created on first use in each process
+anthropic_client = LazyClient(_create_anthropic_client)
+
+# Optimization cache shared with the Celery workers through Redis
+optimization_cache = OptimizationCache(
+    Config.REDIS_URL,
+    Config.OPTIMIZE_CACHE_TTL,
+    Config.OPTIMIZE_CACHE_MAX_ENTRIES,
+    Config.OPTIMIZE_CACHE_L1_SIZE,
+    Config.OPTIMIZE_CACHE_L1_TTL
+)
+
+# Bounded pool shared by all requests for per-platform optimization calls
+optimize_executor = ThreadPoolExecutor(
+    max_workers=Config.OPTIMIZE_MAX_WORKERS,
+    thread_name_prefix='optimize'
+)
 
 PLATFORM_CONSTRAINTS = {
     "Twitter": {
         "max_length": 280,
+        "max_hashtags": 2,
+        "hashtag_separator": " ",
+        "policy": Config.TWITTER_OPTIMIZE_POLICY,
         "prompt": """You are a social media expert. Optimize this content for Twitter (X):
 - Keep it under 280 characters
 - Make it engaging and shareable
@@ -30,6 +59,9 @@ Content: {content}
     },
     "Threads": {
         "max_length": 500,
+        "max_hashtags": 1,
+        "hashtag_separator": "\n\n",
+        "policy": Config.THREADS_OPTIMIZE_POLICY,
         "prompt": """You are a social media expert. Optimize this content for Instagram Threads:
 - Keep it under 500 characters
 - Make it conversational and authentic
@@ -41,6 +73,9 @@ Content: {content}
     },
     "LinkedIn": {
         "max_length": 1300,
+        "max_hashtags": 5,
+        "hashtag_separator": "\n\n",
+        "policy": Config.LINKEDIN_OPTIMIZE_POLICY,
         "prompt": """You are a social media expert. Optimize this content for LinkedIn:
 - Keep it under 1300 characters
 - Make it professional and insightful
@@ -54,66 +89,295 @@ Content: {content}
 
 def validate_content(content: str) -> Tuple[bool, Optional[str]]:
     """Validates the content for basic and advanced requirements."""
-    if not content:
-        return False, "Content cannot be empty"
-    if len(content) > 1000:
-        return False, "Content exceeds maximum length of 1000 characters"
-    if not re.match(r'^[\w\s\d.,!?@#$%^&*()\-+=;:\'"\[\]{}|\\/]+$', content):
-        return False, "Content contains invalid characters"
-
-    # Language detection
-    try:
-        language = detect(content)
-        if language not in ['en', 'es', 'fr', 'de']:  # Supported languages
-            return False, f"Unsupported language: {language}"
-    except LangDetectException:
-        return False, "Unable to detect language"
+    return content_validator.validate(content)
+
+def validate_many(contents: Iterable[str]) -> List[Tuple[bool, Optional[str]]]:
+    """Validates a batch of contents."""
+    return content_validator.validate_many(contents)
+
+def optimization_cache_key(content: str, platform: str) -> str:
+    """Returns the optimization cache key for content on a platform."""
+    prompt = PLATFORM_CONSTRAINTS[platform]["prompt"]
+    return OptimizationCache.make_key(content, platform, prompt, Config.ANTHROPIC_MODEL)
 
-    # Prohibited content
-    prohibited_words = ['badword1', 'badword2']  # Example list
-    if any(word in content.lower() for word in prohibited_words):
-        return False, "Content contains prohibited language"
+def _variant_field(platform: str) -> str:
+    """Names a platform's variants in the near-duplicate index; changes with the prompt or model."""
+    return f"{platform}:{optimization_cache_key('', platform)[:12]}"
 
-    return True, None
+def reuse_variant(content: str, platform: str) -> Optional[str]:
+    """Returns a stored variant of this content or, patched, of a near-duplicate."""
+    cache_key = optimization_cache_key(content, platform)
+    cached = optimization_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    variant = near_duplicate_index.lookup(content, _variant_field(platform))
+    if variant is None or len(variant) > PLATFORM_CONSTRAINTS[platform]["max_length"]:
+        return None
+    optimization_cache.set(cache_key, variant)
+    return variant
+
+def remember_variant(content: str, platform: str, variant: str) -> None:
+    """Stores an LLM-optimized variant in the cache and the near-duplicate index."""
+    optimization_cache.set(optimization_cache_key(content, platform), variant)
+    near_duplicate_index.add(content, _variant_field(platform), variant)
+
+def local_variant(content: str, platform: str) -> Optional[str]:
+    """Formats content locally if the platform's policy lets it skip the LLM.
+
+    Returns None when the LLM is needed; either way the decision is counted.
+    """
+    variant = optimize_locally(content, PLATFORM_CONSTRAINTS[platform])
+    optimize_paths.inc(platform=platform, path='llm' if variant is None else 'local')
+    return variant
+
+def stream_completion(prompt: str, max_length: int) -> Tuple[str, str]:
+    """Streams a completion and stops reading once the platform can use no more of it.
+
+    Reading stops when the text reaches ``max_length`` (budget) or when a
+    sentence ends with less than OPTIMIZE_STREAM_MIN_TAIL characters of
+    room left (boundary). Closing the stream drops the connection, so the
+    tokens that would have been cut anyway are never generated. Returns
+    (text, reason) where reason is budget, boundary or complete.
+    """
+    stream = anthropic_client.completions.create(
+        model=Config.ANTHROPIC_MODEL,
+        max_tokens_to_sample=150,
+        prompt=prompt,
+        temperature=0.7,
+        stream=True
+    )
+    text, reason = "", "complete"
+    try:
+        for event in stream:
+            text += event.completion or ""
+            length = len(text.strip())
+            if length >= max_length:
+                reason = "budget"
+                break
+            if max_length - length < Config.OPTIMIZE_STREAM_MIN_TAIL and text.rstrip().endswith(SENTENCE_ENDINGS):
+                reason = "boundary"
+                break
+    finally:
+        stream.close()
+    return text, reason
 
-@lru_cache(maxsize=1024)
 def optimize_content(content: str, platform: str) -> str:
-    """Optimizes content for the specified platform using Anthropic's Claude."""
+    """Optimizes content for the specified platform using Anthropic's Claude.
+
+    Content the platform's policy can handle locally never reaches the cache
+    or the LLM. Otherwise a cached variant of the same content, or a patched
+    one of a near-duplicate, is reused before calling the model.
+    """
     try:
         platform_config = PLATFORM_CONSTRAINTS[platform]
-        prompt = platform_config["prompt"].format(content=content)
+        local = local_variant(content, platform)
+        if local is not None:
+            return local
 
-        response = anthropic_client.completions.create(
-            model="claude-3.5-sonnet",
-            max_tokens_to_sample=150,
-            prompt=prompt,
-            temperature=0.7
-        )
+        reused = reuse_variant(content, platform)
+        if reused is not None:
+            return reused
 
-        optimized_content = response.completion.strip()
+        prompt = platform_config["prompt"].format(content=content)
+
+        start = time.perf_counter()
+        if Config.OPTIMIZE_STREAM:
+            completion, reason = stream_completion(prompt, platform_config["max_length"])
+            record_llm_usage('stream', time.perf_counter() - start, prompt, completion)
+            llm_stream_stops.inc(platform=platform, reason=reason)
+        else:
+            response = anthropic_client.completions.create(
+                model=Config.ANTHROPIC_MODEL,
+                max_tokens_to_sample=150,
+                prompt=prompt,
+                temperature=0.7
+            )
+            completion = response.completion
+            record_llm_usage('single', time.perf_counter() - start, prompt, completion,
+                             getattr(response, 'usage', None))
 
         # Ensure content meets platform constraints
-        if len(optimized_content) > platform_config["max_length"]:
-            optimized_content = optimized_content[:platform_config["max_length"]]
+        optimized_content = smart_truncate(completion.strip(), platform_config["max_length"])
 
+        remember_variant(content, platform, optimized_content)
         return optimized_content
 
     except Exception as e:
         logger.error(f"Error optimizing content for {platform}: {str(e)}")
         raise
 
-def post_to_platform(platform: str, content: str) -> dict:
-    """Posts optimized content to the specified platform."""
+BATCH_PROMPT = """You are a social media expert. Optimize this content for each of the following platforms:
+
+{guidelines}
+
+Respond with only a JSON object that maps each platform name ({platforms}) to its optimized content.
+
+Content: {content}
+"""
+
+def _platform_guidelines(platform: str) -> str:
+    """Extracts the bullet-point guidelines from a platform's prompt."""
+    lines = PLATFORM_CONSTRAINTS[platform]["prompt"].splitlines()
+    return "\n".join([f"{platform}:"] + [line for line in lines if line.startswith("- ")])
+
+def parse_batch_response(completion: str, platforms: Iterable[str]) -> Tuple[Dict[str, str], List[str]]:
+    """Parses a batched completion into per-platform variants.
+
+    Returns (variants, failed) where failed lists the platforms whose variant
+    was missing, malformed or longer than the platform's max_length.
+    """
+    platforms = list(platforms)
+    try:
+        data = json.loads(completion[completion.index("{"):completion.rindex("}") + 1])
+    except ValueError:
+        return {}, platforms
+    if not isinstance(data, dict):
+        return {}, platforms
+
+    variants, failed = {}, []
+    for platform in platforms:
+        variant = data.get(platform)
+        if not isinstance(variant, str) or not variant.strip():
+            failed.append(platform)
+        elif len(variant.strip()) > PLATFORM_CONSTRAINTS[platform]["max_length"]:
+            failed.append(platform)
+        else:
+            variants[platform] = variant.strip()
+    return variants, failed
+
+def optimize_content_batch(content: str, platforms: Iterable[str]) -> Tuple[Dict[str, str], List[str]]:
+    """Optimizes content for several platforms with a single Claude request."""
+    variants = {}
+    for platform in platforms:
+        local = local_variant(content, platform)
+        if local is not None:
+            variants[platform] = local
+            continue
+        reused = reuse_variant(content, platform)
+        if reused is not None:
+            variants[platform] = reused
+    platforms = [platform for platform in platforms if platform not in variants]
+    if not platforms:
+        return variants, []
+
+    prompt = BATCH_PROMPT.format(
+        guidelines="\n\n".join(_platform_guidelines(platform) for platform in platforms),
+        platforms=", ".join(platforms),
+        content=content
+    )
+
+    start = time.perf_counter()
+    response = anthropic_client.completions.create(
+        model=Config.ANTHROPIC_MODEL,
+        max_tokens_to_sample=150 * len(platforms),
+        prompt=prompt,
+        temperature=0.7
+    )
+    record_llm_usage('batch', time.perf_counter() - start, prompt, response.completion, getattr(response, 'usage', None))
+
+    generated, failed = parse_batch_response(response.completion, platforms)
+    for platform, variant in generated.items():
+        remember_variant(content, platform, variant)
+    variants.update(generated)
+    if failed:
+        logger.warning(f"Batched optimization fell back for: {', '.join(failed)}")
+    return variants, failed
+
+def _timed_optimize(content: str, platform: str) -> Tuple[Optional[str], Optional[str], float]:
+    """Runs optimize_content and returns (result, error, duration in ms)."""
+    start = time.monotonic()
+    try:
+        return optimize_content(content, platform), None, (time.monotonic() - start) * 1000
+    except Exception as e:
+        return None, str(e), (time.monotonic() - start) * 1000
+
+def optimize_for_platforms(
+    content: str,
+    platforms: Optional[Iterable[str]] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[Dict[str, str], Dict[str, str], Dict[str, float]]:
+    """Optimizes content for several platforms concurrently within a deadline.
+
+    Returns (optimized, errors, timings) where timings are in milliseconds.
+    Platforms that fail or miss the deadline are reported in errors instead
+    of failing the whole request. In batch mode all platforms are requested
+    in one call first and only the ones that fail parsing are retried
+    individually.
+    """
+    platforms = list(platforms or PLATFORM_CONSTRAINTS.keys())
+    timeout = Config.OPTIMIZE_TIMEOUT if timeout is None else timeout
+
+    start = time.monotonic()
+    optimized, errors, timings = {}, {}, {}
+    pending = platforms
+
+    if Config.OPTIMIZE_BATCH_MODE and len(platforms) > 1:
+        # A batch that times out must leave the per-platform fallback time to run
+        batch = optimize_executor.submit(optimize_content_batch, content, platforms)
+        try:
+            variants, pending = batch.result(timeout=timeout * (1 - Config.OPTIMIZE_FALLBACK_RESERVE))
+            elapsed = (time.monotonic() - start) * 1000
+            for platform, variant in variants.items():
+                optimized[platform], timings[platform] = variant, elapsed
+        except FutureTimeoutError:
+            batch.cancel()
+            logger.warning(f"Batched optimization missed its share of the {timeout}s deadline, falling back per platform")
+            pending = platforms
+        except Exception as e:
+            logger.warning(f"Batched optimization failed, falling back per platform: {str(e)}")
+            pending = platforms
+
+    remaining = max(0.0, timeout - (time.monotonic() - start))
+    submitted = time.monotonic()
+    futures = {
+        optimize_executor.submit(_timed_optimize, content, platform): platform
+        for platform in pending
+    }
+    done, not_done = wait(futures, timeout=remaining)
+
+    for future in done:
+        platform = futures[future]
+        variant, error, timings[platform] = future.result()
+        if error is None:
+            optimized[platform] = variant
+        else:
+            errors[platform] = error
+
+    for future in not_done:
+        platform = futures[future]
+        future.cancel()
+        errors[platform] = f"Optimization timed out after {timeout}s"
+        timings[platform] = (time.monotonic() - submitted) * 1000
+        logger.warning(f"Optimization for {platform} missed the {timeout}s deadline")
+
+    return optimized, errors, {p: round(t, 1) for p, t in timings.items()}
+
+def post_to_platform(platform: str, content: str, media: Optional[List[dict]] = None) -> dict:
+    """Posts optimized content, with its media uploaded first, to the specified platform."""
     if platform == "Threads":
-        return post_to_threads(content)
+        post = post_to_threads
     elif platform == "Twitter":
-        return post_to_twitter(content)
+        post = post_to_twitter
     elif platform == "LinkedIn":
-        return post_to_linkedin(content)
+        post = post_to_linkedin
     else:
         raise ValueError(f"Unsupported platform: {platform}")
 
-def post_to_threads(content: str) -> dict:
+    uploaded = media_uploader.upload_all(platform, media) if media else []
+
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        result = post(content, uploaded)
+        outcome = 'success'
+        return result
+    except PlatformRateLimited:
+        outcome = 'rate_limited'
+        raise
+    finally:
+        platform_request_seconds.observe(time.perf_counter() - start, platform=platform, outcome=outcome)
+
+def post_to_threads(content: str, media: Optional[List[UploadedMedia]] = None) -> dict:
     """Posts content to Threads with error handling."""
     try:
         headers = {
@@ -124,12 +388,18 @@ def post_to_threads(content: str) -> dict:
             "app_id": Config.THREADS_APP_ID,
             "content": content
         }
-        response = requests.post(
+        if media:
+            payload["media"] = [{"handle": item.media_id, "alt_text": item.alt_text} for item in media]
+        session = http_clients.get("Threads")
+        response = session.post(
             Config.THREADS_API_URL,
             headers=headers,
             json=payload,
             timeout=10
         )
+        backoff = quota_scheduler.record("Threads", platform_account("Threads"), response)
+        if backoff and response.status_code == 429:
+            raise PlatformRateLimited("Threads", backoff)
         response.raise_for_status()
         return response.json()
 
@@ -137,7 +407,7 @@ def post_to_threads(content: str) -> dict:
         logger.error(f"Threads API error: {str(e)}")
         raise
 
-def post_to_twitter(content: str) -> dict:
+def post_to_twitter(content: str, media: Optional[List[UploadedMedia]] = None) -> dict:
     """Posts content to Twitter with error handling."""
     try:
         headers = {
@@ -145,13 +415,18 @@ def post_to_twitter(content: str) -> dict:
             "Content-Type": "application/json"
         }
         payload = {"text": content}
-        session = requests_retry_session()
+        if media:
+            payload["media"] = {"media_ids": [item.media_id for item in media]}
+        session = http_clients.get("Twitter")
         response = session.post(
             Config.TWITTER_API_URL,
             headers=headers,
             json=payload,
             timeout=10
         )
+        backoff = quota_scheduler.record("Twitter", platform_account("Twitter"), response)
+        if backoff and response.status_code == 429:
+            raise PlatformRateLimited("Twitter", backoff)
         response.raise_for_status()
         return response.json()
 
@@ -159,7 +434,7 @@ def post_to_twitter(content: str) -> dict:
         logger.error(f"Twitter API error: {str(e)}")
         raise
 
-def post_to_linkedin(content: str) -> dict:
+def post_to_linkedin(content: str, media: Optional[List[UploadedMedia]] = None) -> dict:
     """Posts content to LinkedIn with error handling."""
     try:
         headers = {
@@ -182,40 +457,27 @@ def post_to_linkedin(content: str) -> dict:
                 "com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"
             }
         }
-        session = requests_retry_session()
+        if media:
+            share = payload["specificContent"]["com.linkedin.ugc.ShareContent"]
+            share["shareMediaCategory"] = "VIDEO" if media[0].kind == 'video' else "IMAGE"
+            share["media"] = [
+                dict({"status": "READY", "media": item.media_id},
+                     **({"description": {"text": item.alt_text}} if item.alt_text else {}))
+                for item in media
+            ]
+        session = http_clients.get("LinkedIn")
         response = session.post(
             Config.LINKEDIN_API_URL,
             headers=headers,
             json=payload,
             timeout=10
         )
+        backoff = quota_scheduler.record("LinkedIn", platform_account("LinkedIn"), response)
+        if backoff and response.status_code == 429:
+            raise PlatformRateLimited("LinkedIn", backoff)
         response.raise_for_status()
         return response.json()
 
     except requests.exceptions.RequestException as e:
         logger.error(f"LinkedIn API error: {str(e)}")
         raise
-
-def requests_retry_session(
-    retries=3,
-    backoff_factor=0.3,
-    status_forcelist=(500, 502, 504),
-    session=None,
-):
-    """Creates a requests session with retry strategy."""
-    from requests.adapters import HTTPAdapter
-    from urllib3.util.retry import Retry
-
-    session = session or requests.Session()
-    retry = Retry(
-        total=retries,
-        read=retries,
-        connect=retries,
-        backoff_factor=backoff_factor,
-        status_forcelist=status_forcelist,
-        allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE', 'HEAD', 'OPTIONS'])
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('https://', adapter)
-    session.mount('http://', adapter)
-    return session
\ No newline at end of file
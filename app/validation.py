@@ -0,0 +1,168 @@
+# app/validation.py
+
+import re
+from functools import lru_cache
+from typing import Tuple, Optional, Iterable, List
+from .config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+VALID_CHARACTERS = re.compile(r'^[\w\s\d.,!?@#$%^&*()\-+=;:\'"\[\]{}|\\/]+$')
+HAS_LETTERS = re.compile(r'[^\W\d_]')
+WORDS = re.compile(r'[^\W\d_]+')
+
+# Frequent function words used to recognise common languages without langdetect
+STOPWORDS = {
+    'en': frozenset('the and is are with for this that you we our of to in on it be will have'.split()),
+    'es': frozenset('el la los las y es con para una un que de en por del nuestro más'.split()),
+    'fr': frozenset('le la les et est avec pour une un que des du nous vous dans sur plus'.split()),
+    'de': frozenset('der die das und ist mit für ein eine wir sie nicht auf den dem zu im'.split()),
+}
+
+def guess_language(content: str, languages: Iterable[str]) -> Optional[str]:
+    """Returns a language when its function words clearly dominate the text."""
+    words = WORDS.findall(content.lower())
+    if len(words) < 4:
+        return None
+    hits = sorted(
+        ((sum(word in STOPWORDS[language] for word in words), language)
+         for language in languages if language in STOPWORDS),
+        reverse=True
+    )
+    if not hits:
+        return None
+    best, language = hits[0]
+    runner_up = hits[1][0] if len(hits) > 1 else 0
+    if best >= 3 and best >= 2 * runner_up and best >= 0.3 * len(words):
+        return language
+    return None
+
+def build_trie_pattern(words: Iterable[str]) -> Optional[re.Pattern]:
+    """Compiles a list of literal terms into a single trie-shaped regex.
+
+    Shared prefixes are factored out so the regex engine walks each position
+    of the text once per trie branch instead of once per term, which keeps
+    matching fast for large term lists.
+    """
+    trie = {}
+    for word in words:
+        word = word.strip().lower()
+        if not word:
+            continue
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+    if not trie:
+        return None
+
+    def to_pattern(node):
+        ends = '' in node
+        branches = [re.escape(char) + to_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if ends:
+            return '(?:' + body + ')?'
+        return body
+
+    return re.compile(to_pattern(trie))
+
+def load_prohibited_words() -> List[str]:
+    """Reads the prohibited terms from Config, one per line in the optional file."""
+    words = [word for word in Config.PROHIBITED_WORDS.split(',') if word.strip()]
+    if Config.PROHIBITED_WORDS_FILE:
+        with open(Config.PROHIBITED_WORDS_FILE, encoding='utf-8') as f:
+            words.extend(line.strip() for line in f if line.strip())
+    return words
+
+class ContentValidator:
+    """Validates post content with precompiled rules.
+
+    Language detection is seeded so results are deterministic and cached per
+    content. Texts dominated by a supported language's function words skip
+    langdetect, and texts shorter than ``min_detect_length`` skip detection
+    entirely since langdetect is unreliable on them anyway.
+    """
+
+    def __init__(self, prohibited_words, supported_languages, max_length=1000,
+                 min_detect_length=20, detect_cache_size=4096):
+        self.max_length = max_length
+        self.supported_languages = frozenset(supported_languages)
+        self.min_detect_length = min_detect_length
+        self.prohibited = build_trie_pattern(prohibited_words)
+        self._factory = None
+        self.detect_language = lru_cache(maxsize=detect_cache_size)(self._detect_language)
+
+    def load_language_profiles(self) -> None:
+        """Loads the langdetect profiles; safe to call more than once."""
+        if self._factory is None:
+            from langdetect import DetectorFactory
+            from langdetect import detector_factory
+
+            DetectorFactory.seed = 0
+            detector_factory.init_factory()
+            self._factory = detector_factory._factory
+
+    def _detect_language(self, content: str) -> str:
+        from langdetect import LangDetectException
+
+        language = guess_language(content, self.supported_languages)
+        if language:
+            return language
+
+        self.load_language_profiles()
+        detector = self._factory.create()
+        detector.append(content)
+        try:
+            return detector.detect()
+        except LangDetectException:
+            return ''
+
+    def validate(self, content: str) -> Tuple[bool, Optional[str]]:
+        """Validates the content for basic and advanced requirements."""
+        if not content:
+            return False, "Content cannot be empty"
+        if not isinstance(content, str):
+            return False, "Content must be a string"
+        if len(content) > self.max_length:
+            return False, f"Content exceeds maximum length of {self.max_length} characters"
+        if not VALID_CHARACTERS.match(content):
+            return False, "Content contains invalid characters"
+
+        # Language detection
+        if not HAS_LETTERS.search(content):
+            return False, "Unable to detect language"
+        if len(content) >= self.min_detect_length:
+            language = self.detect_language(content)
+            if not language:
+                return False, "Unable to detect language"
+            if language not in self.supported_languages:
+                return False, f"Unsupported language: {language}"
+
+        # Prohibited content
+        if self.prohibited and self.prohibited.search(content.lower()):
+            return False, "Content contains prohibited language"
+
+        return True, None
+
+    def validate_many(self, contents: Iterable[str]) -> List[Tuple[bool, Optional[str]]]:
+        """Validates a batch of contents, validating repeated contents once."""
+        seen = {}
+        results = []
+        for content in contents:
+            if not isinstance(content, str):
+                results.append(self.validate(content))
+            elif content in seen:
+                results.append(seen[content])
+            else:
+                results.append(seen.setdefault(content, self.validate(content)))
+        return results
+
+content_validator = ContentValidator(
+    load_prohibited_words(),
+    Config.SUPPORTED_LANGUAGES.split(','),
+    min_detect_length=Config.LANGDETECT_MIN_LENGTH,
+    detect_cache_size=Config.LANGDETECT_CACHE_SIZE
+)